@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Script to move BP accounts to documents keyed by their legal entity.
+
+AccountRepository stores the BP account of a legal entity at
+account/BP_{legal_entity_uuid} so it can be read with a direct get. BP
+accounts created before that change are stored under their account_uuid and
+are only found through the repository's fallback query. This script moves
+each of them to its legal-entity keyed ID; once it has run, the fallback in
+AccountRepository.get_bp_account_by_legal_entity can be removed.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from dotenv import load_dotenv
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.repositories.account_repository import AccountRepository
+from src.repositories.firestore_dao import FirestoreDAO
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def backfill_bp_account_ids(dao: FirestoreDAO, dry_run: bool) -> int:
+    """
+    Move BP accounts stored under their account_uuid to BP_{legal_entity_uuid}.
+
+    Each move writes the new document and deletes the old one in a single
+    batch. Legal entities that already have a keyed account are left alone;
+    if several legacy BP accounts share a legal entity, only the first one is
+    moved, matching the account the lookup used to return.
+
+    Args:
+        dao: Firestore DAO instance
+        dry_run: Log the moves without writing them
+
+    Returns:
+        Number of accounts moved
+    """
+    accounts = await dao.query_documents("account", [("account_type", "==", "BP")])
+    logger.info(f"Found {len(accounts)} BP accounts")
+
+    keyed = {account["document_id"] for account in accounts}
+    moved = 0
+    for account in accounts:
+        document_id = account.pop("document_id")
+        legal_entity_uuid = account.get("legal_entity_uuid")
+        if not legal_entity_uuid:
+            logger.warning(f"BP account {document_id} has no legal_entity_uuid, skipping")
+            continue
+
+        target_id = AccountRepository.bp_account_document_id(legal_entity_uuid)
+        if document_id == target_id:
+            continue
+        if target_id in keyed:
+            logger.warning(f"BP account {document_id} not moved: {target_id} already exists")
+            continue
+
+        logger.info(f"Moving BP account {document_id} to {target_id}")
+        if not dry_run:
+            await dao.batch_write([
+                ("set", "account", target_id, account),
+                ("delete", "account", document_id, None)
+            ])
+        keyed.add(target_id)
+        moved += 1
+
+    logger.info(f"{'Would move' if dry_run else 'Moved'} {moved} BP accounts")
+    return moved
+
+async def main() -> None:
+    """Main function to run the backfill."""
+    # Load environment variables from .env file
+    dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+    load_dotenv(dotenv_path)
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Move BP accounts to legal-entity keyed document IDs')
+    parser.add_argument('--project-id', '-p', type=str, help='Firestore project ID')
+    parser.add_argument('--dry-run', '-d', action='store_true', help='Dry run mode (no writes)')
+    args = parser.parse_args()
+
+    # Get project ID from args or env var
+    project_id = args.project_id or os.environ.get('FIRESTORE_PROJECT_ID')
+    if not project_id:
+        logger.error("Firestore project ID not provided. Use --project-id or set FIRESTORE_PROJECT_ID env var")
+        return
+
+    logger.info(f"Starting BP account backfill with project ID: {project_id}")
+    logger.info(f"Dry run mode: {args.dry_run}")
+
+    dao = FirestoreDAO(project_id=project_id)
+    await backfill_bp_account_ids(dao, args.dry_run)
+
+    logger.info("Backfill completed")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Script to copy existing invoice and other_doc records under their payment advice.
+
+Records written before the payment_advice/{uuid}/invoice and
+payment_advice/{uuid}/other_doc layout only exist in the top-level
+collections. Repository updates write both copies in one batch, which fails
+when the nested copy is missing, so run this once after deploying the layout.
+The top-level documents are authoritative; re-running the script overwrites
+the nested copies with them again.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from dotenv import load_dotenv
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.repositories.firestore_dao import BATCH_WRITE_LIMIT, FirestoreDAO
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Collections nested under their payment advice
+NESTED_COLLECTIONS = ["invoice", "other_doc"]
+
+async def backfill_collection(dao: FirestoreDAO, collection: str, dry_run: bool) -> int:
+    """
+    Copy every document of a top-level collection under its payment advice.
+
+    Args:
+        dao: Firestore DAO instance
+        collection: Top-level collection name
+        dry_run: Count the documents without writing them
+
+    Returns:
+        Number of documents copied
+    """
+    ops = []
+    copied = 0
+    async for doc in dao.stream_documents(collection):
+        document_id = doc.pop("document_id")
+        payment_advice_uuid = doc.get("payment_advice_uuid")
+        if not payment_advice_uuid:
+            logger.warning(f"{collection} {document_id} has no payment_advice_uuid, skipping")
+            continue
+
+        ops.append(("set", f"payment_advice/{payment_advice_uuid}/{collection}", document_id, doc))
+        if len(ops) == BATCH_WRITE_LIMIT:
+            if not dry_run:
+                await dao.batch_write(ops)
+            copied += len(ops)
+            ops = []
+
+    if ops:
+        if not dry_run:
+            await dao.batch_write(ops)
+        copied += len(ops)
+
+    logger.info(f"{'Would copy' if dry_run else 'Copied'} {copied} {collection} documents")
+    return copied
+
+async def main() -> None:
+    """Main function to run the backfill."""
+    # Load environment variables from .env file
+    dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+    load_dotenv(dotenv_path)
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Copy invoice and other_doc records under their payment advice')
+    parser.add_argument('--project-id', '-p', type=str, help='Firestore project ID')
+    parser.add_argument('--dry-run', '-d', action='store_true', help='Dry run mode (no writes)')
+    args = parser.parse_args()
+
+    # Get project ID from args or env var
+    project_id = args.project_id or os.environ.get('FIRESTORE_PROJECT_ID')
+    if not project_id:
+        logger.error("Firestore project ID not provided. Use --project-id or set FIRESTORE_PROJECT_ID env var")
+        return
+
+    logger.info(f"Starting backfill with project ID: {project_id}")
+    logger.info(f"Dry run mode: {args.dry_run}")
+
+    dao = FirestoreDAO(project_id=project_id)
+    for collection in NESTED_COLLECTIONS:
+        await backfill_collection(dao, collection, args.dry_run)
+
+    logger.info("Backfill completed")
+
+if __name__ == "__main__":
+    asyncio.run(main())
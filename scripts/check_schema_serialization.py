@@ -0,0 +1,34 @@
+"""Check the generated Firestore serializers of the schema dataclasses."""
+
+import os
+import sys
+from datetime import date, datetime
+
+# Add the project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.schemas import PaymentAdvice
+
+
+def main():
+    """Serialize payment advices with the date shapes found in stored data."""
+    # LLM output carries dates as DD-MM-YYYY strings; they are stored as-is
+    advice = PaymentAdvice(email_log_uuid="email-1", payment_advice_date="24-05-2025")
+    assert advice._to_firestore_dict()["payment_advice_date"] == "24-05-2025"
+    
+    # Plain dates become midnight datetimes, datetimes and None pass through
+    advice = PaymentAdvice(email_log_uuid="email-1", payment_advice_date=date(2025, 5, 24))
+    assert advice._to_firestore_dict()["payment_advice_date"] == datetime(2025, 5, 24)
+    
+    now = datetime(2025, 5, 24, 10, 30)
+    advice = PaymentAdvice(email_log_uuid="email-1", payment_advice_date=now)
+    assert advice._to_firestore_dict()["payment_advice_date"] is now
+    
+    advice = PaymentAdvice(email_log_uuid="email-1")
+    assert advice._to_firestore_dict()["payment_advice_date"] is None
+    
+    print("Schema serialization checks passed")
+
+
+if __name__ == "__main__":
+    main()
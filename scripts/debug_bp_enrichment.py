@@ -136,13 +136,15 @@ async def debug_bp_account():
                 logger.info(f"Line {line.get('payment_advice_line_uuid')}: BP Code = {line.get('bp_code')}")
         
         # Categorize lines
-        bp_lines, gl_lines = await enrichment_service.categorize_lines(lines)
+        bp_lines, gl_lines = enrichment_service.categorize_lines(lines)
         logger.info(f"Categorized into {len(bp_lines)} BP lines and {len(gl_lines)} GL lines")
         
         # Test BP line enrichment
         if bp_lines:
             logger.info(f"Testing BP line enrichment for {len(bp_lines)} BP lines")
-            enriched_bp_lines = await enrichment_service.enrich_bp_lines(bp_lines, legal_entity_uuid)
+            enriched_bp_lines, bp_enriched = await enrichment_service.enrich_bp_lines(bp_lines, legal_entity_uuid)
+            if not bp_enriched:
+                logger.warning(f"No BP account found for legal entity {legal_entity_uuid}")
             
             # Check if BP codes were applied
             bp_codes_after = sum(1 for line in enriched_bp_lines if line.get('bp_code'))
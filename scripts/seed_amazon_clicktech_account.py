@@ -17,6 +17,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.repositories.firestore_dao import FirestoreDAO
 from src.models.account import Account
+from src.repositories.account_repository import AccountRepository
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -74,7 +75,7 @@ async def seed_amazon_account():
             
             await dao.update_document(
                 "account", 
-                account_uuid, 
+                existing_account.get('document_id', account_uuid), 
                 {
                     "sap_account_id": AMAZON_BP_ACCOUNT.get("sap_account_id"),
                     "updated_at": datetime.utcnow()
@@ -95,7 +96,11 @@ async def seed_amazon_account():
                 "updated_at": datetime.utcnow()
             }
             
-            await dao.add_document("account", AMAZON_BP_ACCOUNT.get("account_uuid"), account_dict)
+            await dao.add_document(
+                "account",
+                AccountRepository.bp_account_document_id(AMAZON_LEGAL_ENTITY_UUID),
+                account_dict
+            )
             logger.info(f"Created BP account {AMAZON_BP_ACCOUNT.get('account_uuid')} with SAP ID {AMAZON_BP_ACCOUNT.get('sap_account_id')} for Amazon legal entity")
 
     except Exception as e:
@@ -15,7 +15,7 @@ from dotenv import load_dotenv
 # Add the parent directory to the Python path so we can import our modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.repositories.firestore_dao import FirestoreDAO
+from src.repositories.firestore_dao import BATCH_WRITE_LIMIT, FirestoreDAO
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -87,10 +87,14 @@ async def seed_legal_entities():
                 logger.info("Exiting without adding/updating records")
                 return
         
-        # Add sample groups to Firestore
-        logger.info("Adding sample groups to Firestore...")
+        # One timestamp for the whole seed run
+        now_iso = datetime.utcnow().isoformat()
+        
+        # Collect the sample groups and entities, then write them in one batched commit
+        ops = []
         for group in SAMPLE_GROUPS:
-            await dao.add_document(
+            ops.append((
+                "set",
                 "group",
                 group.get("group_uuid"),
                 {
@@ -98,20 +102,17 @@ async def seed_legal_entities():
                     "group_name": group.get("group_name"),
                     "is_active": True,
                     "metadata": None,
-                    "group_created_at": datetime.utcnow().isoformat(),
-                    "group_updated_at": datetime.utcnow().isoformat(),
+                    "group_created_at": now_iso,
+                    "group_updated_at": now_iso,
                     "group_deleted_at": None,
-                    "created_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
+                    "created_at": now_iso,
+                    "updated_at": now_iso
                 }
-            )
-            logger.info(f"Added/updated group: {group.get('group_name')}")
+            ))
         
-        # Add sample entities to Firestore
-        logger.info("Adding sample legal entities to Firestore...")
         for entity in SAMPLE_LEGAL_ENTITIES:
-            # Also add to Firestore for persistence
-            await dao.add_document(
+            ops.append((
+                "set",
                 "legal_entity", 
                 entity.get("legal_entity_uuid"), 
                 {
@@ -121,10 +122,18 @@ async def seed_legal_entities():
                     "is_active": True,
                     "metadata": None,
                     "alternate_names": entity.get("alternate_names", []),
-                    "created_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
+                    "created_at": now_iso,
+                    "updated_at": now_iso
                 }
-            )
+            ))
+        
+        logger.info("Adding sample groups and legal entities to Firestore...")
+        # A WriteBatch accepts at most BATCH_WRITE_LIMIT writes
+        for start in range(0, len(ops), BATCH_WRITE_LIMIT):
+            await dao.batch_write(ops[start:start + BATCH_WRITE_LIMIT])
+        for group in SAMPLE_GROUPS:
+            logger.info(f"Added/updated group: {group.get('group_name')}")
+        for entity in SAMPLE_LEGAL_ENTITIES:
             logger.info(f"Added/updated legal entity: {entity.get('legal_entity_name')} (Group: {entity.get('group_uuid')})")
         
         logger.info(f"Successfully added {len(SAMPLE_GROUPS)} groups and {len(SAMPLE_LEGAL_ENTITIES)} legal entities to Firestore")
@@ -57,7 +57,7 @@ class BatchManager:
             )
             
             # Add to Firestore
-            await self.dao.add_document("batch_run", run_id, self.batch_run.__dict__)
+            await self.dao.add_document("batch_run", run_id, self.batch_run)
             logger.info(f"Started batch run with ID {run_id}")
             
             return run_id
@@ -33,7 +33,9 @@ from src.batch_worker.batch_manager import BatchManager, BatchRunStatus
 from src.repositories.firestore_dao import FirestoreDAO
 from src.external_apis.gcp.gcs_uploader import GCSUploader
 from src.external_apis.gcp.gmail_reader import GmailReader, GMAIL_AVAILABLE
+from src.external_apis.llm.constants import LLM_LEGAL_ENTITY_UUID_KEY
 from src.services.email.email_processor import EmailProcessor
+from src.services.email.pdf_text_extractor import shutdown_pdf_executor
 from src.services.payment_advice_db_logger import PaymentAdviceDbLogger
 from src.services.sap_export_service import SAPExportService
 from src.services.account_enrichment_service import AccountEnrichmentService
@@ -164,12 +166,22 @@ class BatchWorkerV2:
     
     async def start_batch_run(self):
         """Start a new batch run."""
+        # Warm instances keep the legal entity catalog in memory; reload it so
+        # entities added since the last run are detected in this one
+        await self.email_processor.legal_entity_lookup.repository.refresh()
         return await self.batch_manager.start_batch_run()
     
     async def finish_batch_run(self):
         """Finish the current batch run."""
         await self.batch_manager.finish_batch_run()
         
+        # The LLM clients pool connections per event loop; release them with the run
+        await self.email_processor.legal_entity_lookup.aclose()
+        await self.legal_entity_lookup.aclose()
+        
+        # The PDF worker processes are not needed between runs
+        await asyncio.to_thread(shutdown_pdf_executor)
+        
     async def create_payment_advice_from_llm_output(self, llm_output: Dict[str, Any], email_log_uuid: str) -> Optional[str]:
         """Create payment advice from LLM output using the payment service."""
         try:
@@ -277,7 +289,7 @@ class BatchWorkerV2:
         
         # Save initial processing log to Firestore
         try:
-            await self.dao.add_document("email_processing_log", email_id, processing_log.__dict__)
+            await self.dao.add_document("email_processing_log", email_id, processing_log)
             logger.info(f"Created email processing log for email {email_id}, batch run {self.batch_manager.batch_run.run_id}")
         except Exception as log_error:
             logger.error(f"Error creating initial processing log: {str(log_error)}")
@@ -287,6 +299,12 @@ class BatchWorkerV2:
             # Process email and create email log
             email_log_uuid, llm_outputs = await self.email_processor.process_email(email_data)
             
+            # Look up the BP accounts of all of this email's payment advices in one
+            # bulk query, so the per-advice enrichment below is served from cache
+            await self.account_enrichment_service.prefetch_bp_accounts(
+                [llm_output.get(LLM_LEGAL_ENTITY_UUID_KEY) for llm_output in llm_outputs]
+            )
+            
             for output_idx, llm_output in enumerate(llm_outputs):
                 # Update the processing log with actual email_log_uuid if different
                 if email_log_uuid != email_id:
@@ -296,7 +314,7 @@ class BatchWorkerV2:
                     })
                     # Also create a reference with the email_log_uuid for easier querying
                     processing_log.email_log_uuid = email_log_uuid
-                    await self.dao.add_document("email_processing_log", email_log_uuid, processing_log.__dict__)
+                    await self.dao.add_document("email_processing_log", email_log_uuid, processing_log)
                 
                 # Update processing log with this batch run
                 await self.dao.update_document("email_processing_log", email_log_uuid, {
@@ -311,9 +329,10 @@ class BatchWorkerV2:
                 logger.info(f"{output_idx + 1}. Detected legal entity UUID: {legal_entity_uuid}")
                 logger.info(f"{output_idx + 1}. Detected group UUIDs: {group_uuids}")
                 
-                # Get legal entity details for verification
+                # Get legal entity details for verification from the already
+                # loaded catalog rather than another Firestore read
                 if legal_entity_uuid:
-                    legal_entity = await self.dao.get_document("legal_entity", legal_entity_uuid)
+                    legal_entity = await self.legal_entity_repo.get_legal_entity_by_id(legal_entity_uuid)
                     if legal_entity:
                         logger.info(f"Legal entity details: Name={legal_entity.get('payer_legal_name')}, Group UUID={legal_entity.get('group_uuid')}")
                         print(f"\n\n=== DETECTED LEGAL ENTITY ===\nName: {legal_entity.get('payer_legal_name')}\nUUID: {legal_entity_uuid}\nGroup UUID: {legal_entity.get('group_uuid')}\n===========================\n\n")
@@ -597,8 +616,10 @@ class BatchWorkerV2:
                     processed_email_ids.append(email_data["email_id"])
                     # Update monitoring sheet after successful processing
                     try:
-                        # Log the full email data structure for debugging
-                        logger.info(f"Email data structure: {json.dumps(email_data, default=str)}")
+                        # Log the full email data structure for debugging; it includes
+                        # raw message and attachment bytes, so only serialize at DEBUG
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("Email data structure: %s", json.dumps(email_data, default=str))
                         
                         # Get the email_log_uuid from wherever it's available
                         email_log_uuid = None
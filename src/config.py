@@ -31,6 +31,31 @@ EMAIL_TEXT_FILENAME = "email.txt"  # Plain text version of email
 EMAIL_HTML_FILENAME = "email.html"  # HTML version of email
 ATTACHMENT_PREFIX = "attachment_"  # Prefix for attachment filenames
 
+# Maximum number of attachments of one email processed by the LLM concurrently
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+
+# Character budget for text extracted from one PDF attachment (0 = no limit);
+# page extraction stops once it is reached
+PDF_TEXT_MAX_CHARS = int(os.environ.get("PDF_TEXT_MAX_CHARS", "0"))
+
+# Maximum number of pages extracted from one PDF attachment; longer PDFs are
+# truncated so pathological documents cannot blow the latency budget
+MAX_PDF_PAGES = int(os.environ.get("MAX_PDF_PAGES", "50"))
+
+# Maximum number of worker processes used to extract text from one large PDF
+PDF_MAX_WORKERS = int(os.environ.get("PDF_MAX_WORKERS", "4"))
+
+# Seconds the legal entity catalog is served from memory before Firestore is
+# queried again
+LEGAL_ENTITY_CACHE_TTL_SECONDS = int(os.environ.get("LEGAL_ENTITY_CACHE_TTL_SECONDS", "300"))
+
+# Maximum number of legal entity detection LLM calls in flight at once
+LEGAL_ENTITY_LLM_MAX_CONCURRENCY = int(os.environ.get("LEGAL_ENTITY_LLM_MAX_CONCURRENCY", "16"))
+
+# Days an extraction LLM response is reused for an identical prompt and
+# document (0 = no response cache)
+LLM_RESPONSE_CACHE_TTL_DAYS = int(os.environ.get("LLM_RESPONSE_CACHE_TTL_DAYS", "30"))
+
 # Account and SAP export configuration
 TDS_ACCOUNT_NAME = "TDS Account"  # Default name for TDS account
 TDS_ACCOUNT_CODE = "30-03-04-06-001"  # Default GL code for TDS account
@@ -257,6 +257,51 @@ class GCSUploader:
             logger.error(f"Error uploading {file_path} to GCS: {str(e)}")
             return None
             
+    def upload_bytes(self, data: bytes, destination_path: str,
+                     content_type: Optional[str] = None) -> Optional[str]:
+        """
+        Upload in-memory content to GCS and return the object path.
+        
+        Args:
+            data: Binary content to upload
+            destination_path: Path in GCS where the content should be stored
+            content_type: Optional MIME type of the content
+            
+        Returns:
+            GCS object path if successful, None otherwise
+        """
+        try:
+            blob = self.bucket.blob(destination_path)
+            blob.upload_from_string(data, content_type=content_type)
+            
+            logger.info(f"Uploaded {len(data)} bytes to gs://{self.bucket_name}/{destination_path}")
+            return destination_path
+            
+        except Exception as e:
+            logger.error(f"Error uploading content to {destination_path} in GCS: {str(e)}")
+            return None
+            
+    def upload_bytes_and_get_signed_url(self, data: bytes, destination_folder: str, filename: str,
+                                        content_type: Optional[str] = None,
+                                        expiration_days: int = 7) -> Optional[str]:
+        """
+        Upload in-memory content to GCS and generate a presigned URL.
+        
+        Args:
+            data: Binary content to upload
+            destination_folder: Folder path in GCS
+            filename: Name to use for the file in GCS
+            content_type: Optional MIME type of the content
+            expiration_days: Number of days until the URL expires
+            
+        Returns:
+            Presigned URL if successful, None otherwise
+        """
+        destination_path = f"{destination_folder}/{filename}"
+        if not self.upload_bytes(data, destination_path, content_type=content_type):
+            return None
+        return self.generate_signed_url(destination_path, expiration_days)
+            
     def upload_and_get_signed_url(self, file_path: str, destination_folder: str, 
                                    filename: Optional[str] = None, 
                                    expiration_days: int = 7) -> Optional[str]:
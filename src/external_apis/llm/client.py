@@ -1,8 +1,10 @@
 """LLM Client for OpenAI API interactions."""
 
+import asyncio
+import json
 import logging
 import os
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Protocol, Union
 from dotenv import load_dotenv, find_dotenv
 
 from openai import OpenAI
@@ -12,6 +14,28 @@ from src.external_apis.llm.config import OPENAI_API_KEY, DEFAULT_MODEL
 
 logger = logging.getLogger(__name__)
 
+# OpenAI Batch API settings for offline (non-interactive) extraction runs
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INITIAL_DELAY = 30.0
+BATCH_POLL_MAX_DELAY = 600.0
+BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+class ResponseCache(Protocol):
+    """
+    Store of LLM responses keyed by request, as used by LLMClient.
+    
+    Implemented by LLMResponseCacheRepository; the service layer passes it in
+    so this module does not depend on the repositories.
+    """
+    
+    def make_key(self, *parts: str) -> str: ...
+    
+    async def get(self, key: str) -> Optional[str]: ...
+    
+    async def put(self, key: str, response_text: str, model: str) -> None: ...
+
 
 class LLMClient:
     """
@@ -24,12 +48,13 @@ class LLMClient:
     It does NOT handle any extraction or processing logic.
     """
     
-    def __init__(self, model: str = DEFAULT_MODEL):
+    def __init__(self, model: str = DEFAULT_MODEL, response_cache: Optional[ResponseCache] = None):
         """
         Initialize the LLM client.
         
         Args:
             model: The model to use for chat completions
+            response_cache: Optional cache of responses to identical requests
         """
         # Initialize OpenAI client
         # env_path = os.path.join(os.getcwd(), "secret.env")
@@ -52,6 +77,7 @@ class LLMClient:
         # Set up the OpenAI client
         self.client = OpenAI(api_key=openai_api_key)
         self.model = model
+        self.response_cache = response_cache
         logger.info(f"LLMClient initialized with model {self.model}")
     
     async def call_chat_api(
@@ -59,16 +85,22 @@ class LLMClient:
         system_prompt: str, 
         user_content: str, 
         temperature: float = 0.0,
-        timeout: float = 90.0
+        timeout: float = 90.0,
+        prompt_cache_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Call the OpenAI Chat Completions API.
         
+        The system prompt is sent first so that calls sharing it share a
+        cacheable prompt prefix; prompt_cache_key groups such calls so they
+        are routed to the same prompt cache.
+        
         Args:
             system_prompt: The system prompt to use
             user_content: The user content to send
             temperature: The temperature for response generation (0.0 for deterministic)
             timeout: Timeout in seconds for the API call
+            prompt_cache_key: Optional key shared by calls with the same system prompt
             
         Returns:
             Dictionary containing:
@@ -93,6 +125,16 @@ class LLMClient:
             "usage": None
         }
         
+        # Identical model, prompt and content give the same extraction; reuse it
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.make_key(self.model, str(temperature), system_prompt, user_content)
+            cached_text = await self.response_cache.get(cache_key)
+            if cached_text is not None:
+                logger.info(f"Using cached {self.model} response with {len(cached_text)} chars")
+                result["response_text"] = cached_text
+                return result
+        
         try:
             # Call the API with timeout
             response = self.client.chat.completions.create(
@@ -102,21 +144,29 @@ class LLMClient:
                     {"role": "user", "content": user_content}
                 ],
                 temperature=temperature,
-                timeout=timeout
+                timeout=timeout,
+                # Passed through extra_body so older SDK versions accept it
+                extra_body={"prompt_cache_key": prompt_cache_key} if prompt_cache_key else None
             )
             
             # Extract the response text
             result["response_text"] = response.choices[0].message.content
             logger.info(f"Got response with {len(result['response_text'])} chars")
             
+            if cache_key is not None and result["response_text"]:
+                await self.response_cache.put(cache_key, result["response_text"], self.model)
+            
             # Log and store token usage if available
             if hasattr(response, 'usage') and response.usage:
                 usage = response.usage
-                logger.info(f"Actual token usage - Prompt: {usage.prompt_tokens}, "
+                prompt_details = getattr(usage, "prompt_tokens_details", None)
+                cached_tokens = getattr(prompt_details, "cached_tokens", None) or 0
+                logger.info(f"Actual token usage - Prompt: {usage.prompt_tokens} ({cached_tokens} cached), "
                             f"Completion: {usage.completion_tokens}, "
                             f"Total: {usage.total_tokens}")
                 result["usage"] = {
                     "prompt_tokens": usage.prompt_tokens,
+                    "cached_prompt_tokens": cached_tokens,
                     "completion_tokens": usage.completion_tokens,
                     "total_tokens": usage.total_tokens
                 }
@@ -145,3 +195,98 @@ class LLMClient:
             raise
             
         return result
+        
+    async def submit_batch(self, items: List[Dict[str, Any]], temperature: float = 0.0) -> str:
+        """
+        Submit chat completion requests to the OpenAI Batch API.
+        
+        Batch requests are billed at a discount and do not count against the
+        synchronous rate limits, at the cost of completing within 24 hours
+        instead of immediately; use for backfills, not interactive processing.
+        
+        Args:
+            items: Requests as dicts with 'custom_id', 'system_prompt' and 'user_content'
+            temperature: The temperature for response generation (0.0 for deterministic)
+            
+        Returns:
+            ID of the created batch
+        """
+        lines = [
+            json.dumps({
+                "custom_id": item["custom_id"],
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": item["system_prompt"]},
+                        {"role": "user", "content": item["user_content"]}
+                    ],
+                    "temperature": temperature
+                }
+            })
+            for item in items
+        ]
+        
+        try:
+            # The OpenAI client is synchronous; keep the event loop free during uploads
+            batch_file = await asyncio.to_thread(
+                self.client.files.create,
+                file=("batch_input.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = await asyncio.to_thread(
+                self.client.batches.create,
+                input_file_id=batch_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=BATCH_COMPLETION_WINDOW
+            )
+            logger.info(f"Submitted batch {batch.id} with {len(items)} requests to {self.model}")
+            return batch.id
+        except Exception as e:
+            logger.error(f"Error submitting batch of {len(items)} requests: {str(e)}")
+            raise
+            
+    async def poll_batch(self, batch_id: str) -> Dict[str, str]:
+        """
+        Wait for a batch to finish and collect its responses.
+        
+        The batch status is polled with exponential backoff, from
+        BATCH_POLL_INITIAL_DELAY up to BATCH_POLL_MAX_DELAY seconds.
+        
+        Args:
+            batch_id: ID returned by submit_batch
+            
+        Returns:
+            Mapping of custom_id to response text; failed requests are logged and omitted
+        """
+        delay = BATCH_POLL_INITIAL_DELAY
+        while True:
+            batch = await asyncio.to_thread(self.client.batches.retrieve, batch_id)
+            if batch.status in BATCH_TERMINAL_STATUSES:
+                break
+            logger.info(f"Batch {batch_id} is {batch.status}, checking again in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BATCH_POLL_MAX_DELAY)
+            
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} ended with status {batch.status}")
+            
+        results = {}
+        if not batch.output_file_id:
+            logger.warning(f"Batch {batch_id} completed without an output file")
+            return results
+            
+        output = await asyncio.to_thread(self.client.files.content, batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.error(f"Batch request {record.get('custom_id')} failed: {record.get('error') or response.get('body')}")
+                continue
+            results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+            
+        logger.info(f"Batch {batch_id} completed with {len(results)} successful responses")
+        return results
@@ -1,13 +1,21 @@
 """LLM client for legal entity detection."""
 
+import asyncio
 import logging
 import os
 import json
-from typing import Dict, Any, Optional, List
+import random
+from typing import Dict, Any, Optional, List, Tuple
 import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# Rate-limited or transiently failing detection calls are retried with
+# exponential backoff and jitter
+LLM_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+LLM_MAX_ATTEMPTS = 3
+LLM_RETRY_BASE_DELAY = 1.0
+
 # Simple prompt for legal entity detection
 LEGAL_ENTITY_DETECTION_PROMPT = """
 You are a legal entity detection system. Your task is to identify which legal entity from the provided list is mentioned in the input text.
@@ -34,6 +42,52 @@ class LegalEntityLLMClient:
         self.api_key = os.environ.get("OPENAI_API_KEY")
         self.default_model = os.environ.get("OPENAI_MODEL", "gpt-4.1")
         
+        # Pooled session reused across calls so TCP/TLS connections stay alive
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Formatted system prompt, rebuilt only when the entity names change
+        self._prompt_source: Optional[List[str]] = None
+        self._prompt_names: Optional[Tuple[str, ...]] = None
+        self._prompt: Optional[str] = None
+        
+    def _get_prompt(self, legal_entity_names: List[str]) -> str:
+        """
+        Return the detection prompt for the given entity names, reusing the last one built.
+        
+        Callers that keep passing the same list object (and replace it rather
+        than mutate it when the catalog changes) skip the name comparison.
+        """
+        if legal_entity_names is self._prompt_source:
+            return self._prompt
+            
+        names = tuple(legal_entity_names)
+        if names != self._prompt_names:
+            legal_entity_list = "\n".join(f"- {name}" for name in names)
+            self._prompt = LEGAL_ENTITY_DETECTION_PROMPT.format(legal_entity_list=legal_entity_list)
+            self._prompt_names = names
+        self._prompt_source = legal_entity_names
+        return self._prompt
+        
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it for the running event loop."""
+        loop = asyncio.get_running_loop()
+        # A session is bound to the loop it was created on; each asyncio.run()
+        # gets a fresh one
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60, ttl_dns_cache=300)
+            )
+            self._session_loop = loop
+        return self._session
+        
+    async def aclose(self) -> None:
+        """Close the shared HTTP session, if one is open."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+        
     async def detect_legal_entity(
         self, 
         legal_entity_names: List[str], 
@@ -55,11 +109,8 @@ class LegalEntityLLMClient:
             logger.error("No OpenAI API key provided")
             return "UNKNOWN"
             
-        # Format the legal entity list for the prompt
-        legal_entity_list = "\n".join([f"- {name}" for name in legal_entity_names])
-        
         # Format the prompt with the legal entity list
-        prompt = LEGAL_ENTITY_DETECTION_PROMPT.format(legal_entity_list=legal_entity_list)
+        prompt = self._get_prompt(legal_entity_names)
         
         # Combine email body and document text if both are provided
         combined_text = ""
@@ -93,20 +144,24 @@ class LegalEntityLLMClient:
             # Log request details for debugging
             logger.info(f"Using model: {self.default_model} for legal entity detection")
             logger.info(f"Prompt context contains {len(legal_entity_names)} legal entity names")
-            logger.debug(f"Available legal entities: {legal_entity_names}")
-            logger.debug(f"Text length for detection - Email: {len(email_body or '')} chars, Document: {len(document_text or '')} chars")
+            logger.debug("Available legal entities: %s", legal_entity_names)
+            logger.debug("Text length for detection - Email: %d chars, Document: %d chars",
+                         len(email_body or ''), len(document_text or ''))
             
-            # Log first 100 chars of the document text for debugging
-            if document_text:
-                preview = document_text[:100].replace('\n', ' ').strip()
-                logger.info(f"Document text preview: '{preview}...'")
+            # Build the text previews only when INFO records are emitted
+            if logger.isEnabledFor(logging.INFO):
+                # Log first 100 chars of the document text for debugging
+                if document_text:
+                    preview = document_text[:100].replace('\n', ' ').strip()
+                    logger.info(f"Document text preview: '{preview}...'")
+                
+                # Log a limited portion of the user text for debugging
+                user_text_sample = combined_text[:200] + "..." if len(combined_text) > 200 else combined_text
+                logger.info(f"Sample of text sent to LLM: {user_text_sample}")
             
-            # Log a limited portion of the user text for debugging
-            user_text_sample = combined_text[:200] + "..." if len(combined_text) > 200 else combined_text
-            logger.info(f"Sample of text sent to LLM: {user_text_sample}")
-            
-            # Make the API call
-            async with aiohttp.ClientSession() as session:
+            # Make the API call over the pooled session
+            session = self._get_session()
+            for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
                 logger.info("Making OpenAI API call for legal entity detection")
                 async with session.post(
                     "https://api.openai.com/v1/chat/completions", 
@@ -114,44 +169,52 @@ class LegalEntityLLMClient:
                     json=payload
                 ) as response:
                     response_status = response.status
-                    result = await response.json()
                     logger.info(f"OpenAI API response status: {response_status}")
-                    logger.info(f"LLM API response status: {response.status}")
-                    
-                    # Log usage statistics if available
-                    if "usage" in result:
-                        usage = result["usage"]
-                        logger.info(f"LLM API usage: {usage}")
-                    
-                    if response_status != 200:
-                        logger.error(f"Error calling OpenAI API: {result}")
-                        return "UNKNOWN"
-                        
-                    try:
-                        entity = result["choices"][0]["message"]["content"].strip()
-                        logger.info(f"Detected entity from LLM: '{entity}'")
-                        
-                        # Log whether it's in the provided list
-                        if entity in legal_entity_names:
-                            logger.info(f"Entity '{entity}' found in legal entity list - EXACT MATCH")
-                        elif entity == "UNKNOWN":
-                            logger.warning("LLM couldn't confidently identify any entity - returned UNKNOWN")
-                        else:
-                            logger.warning(f"Entity '{entity}' NOT found in legal entity list - potential parsing issue")
-                            # Check for fuzzy matches - in case the entity name has slight differences
-                            for name in legal_entity_names:
-                                if entity.lower() in name.lower() or name.lower() in entity.lower():
-                                    logger.info(f"Found fuzzy match: '{entity}' ~ '{name}'")
-                        
-                        return entity
-                    except (KeyError, IndexError) as e:
-                        logger.error(f"Error parsing LLM response: {str(e)}")
-                        logger.error(f"Response: {json.dumps(result)}")
-                        return "UNKNOWN"
+                    # Error pages of retried responses are not necessarily JSON
+                    retry = response_status in LLM_RETRY_STATUSES and attempt < LLM_MAX_ATTEMPTS
+                    if not retry:
+                        result = await response.json()
                         
+                if not retry:
+                    break
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                logger.warning(f"OpenAI API returned {response_status}, retrying in {delay:.1f}s "
+                               f"(attempt {attempt}/{LLM_MAX_ATTEMPTS})")
+                await asyncio.sleep(delay)
+            
+            # Log usage statistics if available
+            if "usage" in result:
+                usage = result["usage"]
+                logger.info(f"LLM API usage: {usage}")
+            
+            if response_status != 200:
+                logger.error(f"Error calling OpenAI API: {result}")
+                return "UNKNOWN"
+                
+            try:
+                entity = result["choices"][0]["message"]["content"].strip()
+                logger.info(f"Detected entity from LLM: '{entity}'")
+                
+                # Log whether it's in the provided list
+                if entity in legal_entity_names:
+                    logger.info(f"Entity '{entity}' found in legal entity list - EXACT MATCH")
+                elif entity == "UNKNOWN":
+                    logger.warning("LLM couldn't confidently identify any entity - returned UNKNOWN")
+                else:
+                    logger.warning(f"Entity '{entity}' NOT found in legal entity list - potential parsing issue")
+                    # Check for fuzzy matches - in case the entity name has slight differences
+                    for name in legal_entity_names:
+                        if entity.lower() in name.lower() or name.lower() in entity.lower():
+                            logger.info(f"Found fuzzy match: '{entity}' ~ '{name}'")
+                
+                return entity
+            except (KeyError, IndexError) as e:
+                logger.error(f"Error parsing LLM response: {str(e)}")
+                logger.error(f"Response: {json.dumps(result)}")
+                return "UNKNOWN"
+                
         except Exception as e:
-            logger.error(f"Error during legal entity detection: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error during legal entity detection: %s", e)
             
             return "UNKNOWN"
@@ -61,7 +61,7 @@ class SapIntegrator:
                         "sap_transaction_id": sap_data.get("transaction_id"),
                         "customer_uuid": sap_data.get("customer_uuid")
                     }
-                    await self.dao.update_document("invoice", invoice.get("invoice_uuid"), updates)
+                    await self._update_with_nested_copy("invoice", payment_advice_uuid, invoice.get("invoice_uuid"), updates)
                     logger.info(f"Enriched invoice {invoice_number} with SAP data")
             
             # Enrich other docs
@@ -78,7 +78,7 @@ class SapIntegrator:
                         "sap_transaction_id": sap_data.get("transaction_id"),
                         "customer_uuid": sap_data.get("customer_uuid")
                     }
-                    await self.dao.update_document("other_doc", other_doc.get("other_doc_uuid"), updates)
+                    await self._update_with_nested_copy("other_doc", payment_advice_uuid, other_doc.get("other_doc_uuid"), updates)
                     logger.info(f"Enriched other doc {other_doc_number} with SAP data")
                     
             return True
@@ -87,6 +87,19 @@ class SapIntegrator:
             logger.error(f"Error enriching documents with SAP data: {str(e)}")
             return False
             
+    async def _update_with_nested_copy(self, collection: str, payment_advice_uuid: str,
+                                       document_id: str, updates: Dict[str, Any]) -> None:
+        """
+        Update a document and its copy nested under the payment advice in one batch.
+        
+        Documents written before the subcollection layout need
+        scripts/backfill_nested_payment_advice_docs.py run first.
+        """
+        await self.dao.batch_write([
+            ("update", collection, document_id, updates),
+            ("update", f"payment_advice/{payment_advice_uuid}/{collection}", document_id, updates)
+        ])
+            
     def _add_specific_other_doc_transactions(self):
         """Add specific TDS-CM document records to the mock SAP client to ensure other_doc enrichment works."""
         # List of specific TDS document numbers seen in logs
@@ -47,6 +47,7 @@ class ProcessingStatus(str, enum.Enum):
     PARSING_COMPLETED = "parsing_completed" 
     SAP_EXPORT_GENERATED = "sap_export_generated" 
     PROCESSING_FAILED = "processing_failed" 
+    SKIPPED = "skipped"  # Nothing to process (no attachments, empty body)
 
 
 class BatchRunStatus(str, enum.Enum):
@@ -294,3 +295,46 @@ class PaymentAdviceLine(BaseModel):
     # Processing status
     sap_enrichment_status: Optional[str] = None  # Status of SAP enrichment
     sap_transaction_id: Optional[str] = None  # SAP transaction ID after enrichment
+
+
+# Specialized Firestore serializers
+_DATE_FIELD_TYPES = (date, Optional[date])
+
+
+def _date_to_datetime(value):
+    """
+    Convert a date to a datetime at midnight; Firestore has no date type.
+    
+    Anything that is not a plain date, such as a datetime or a date string
+    taken straight from LLM output, is passed through unchanged.
+    """
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+
+def _compile_firestore_serializer(cls):
+    """
+    Generate a flat serializer for a schema dataclass.
+    
+    The generated ``_to_firestore_dict`` reads each field directly instead of
+    walking the instance reflectively like ``dataclasses.asdict``.
+    """
+    items = []
+    for f in fields(cls):
+        if f.type in _DATE_FIELD_TYPES:
+            items.append(f"{f.name!r}: _date_to_datetime(self.{f.name})")
+        else:
+            items.append(f"{f.name!r}: self.{f.name}")
+    source = "lambda self: {" + ", ".join(items) + "}"
+    code = compile(source, f"<{cls.__name__}._to_firestore_dict>", "eval")
+    cls._to_firestore_dict = eval(code, {"_date_to_datetime": _date_to_datetime})
+    return cls
+
+
+for _schema in (
+    Group, LegalEntity, Customer, Email, Domain, CustEmailDomainMap,
+    EmailLog, PaymentAdvice, Invoice, OtherDoc, Settlement,
+    BatchRun, EmailProcessingLog, SapErrorDlq, PaymentAdviceLine,
+):
+    _compile_firestore_serializer(_schema)
@@ -6,6 +6,7 @@ from src.repositories.invoice_repository import InvoiceRepository
 from src.repositories.other_doc_repository import OtherDocRepository
 from src.repositories.payment_advice_repository import PaymentAdviceRepository
 from src.repositories.settlement_repository import SettlementRepository
+from src.repositories.batched_writer import BatchedWriter
 
 __all__ = [
     "FirestoreDAO",
@@ -13,5 +14,6 @@ __all__ = [
     "InvoiceRepository",
     "OtherDocRepository",
     "PaymentAdviceRepository",
-    "SettlementRepository"
+    "SettlementRepository",
+    "BatchedWriter"
 ]
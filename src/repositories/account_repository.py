@@ -1,6 +1,8 @@
 """Repository for Account entities in Firestore."""
 
+import asyncio
 import logging
+from itertools import islice
 from typing import Dict, List, Optional, Any, Tuple
 from uuid import uuid4
 from datetime import datetime
@@ -10,6 +12,13 @@ from src.repositories.firestore_dao import FirestoreDAO
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of values Firestore accepts in an "in" filter
+IN_QUERY_LIMIT = 30
+
+# BP accounts are stored under a document ID derived from their legal entity,
+# so the per-advice lookup is a direct get instead of a two-field query
+BP_ACCOUNT_ID_PREFIX = "BP_"
+
 class AccountRepository:
     """Repository for Account entities in Firestore."""
     
@@ -17,6 +26,38 @@ class AccountRepository:
         """Initialize with Firestore DAO."""
         self.dao = dao
     
+    @staticmethod
+    def bp_account_document_id(legal_entity_uuid: str) -> str:
+        """Document ID under which the BP account of a legal entity is stored."""
+        return f"{BP_ACCOUNT_ID_PREFIX}{legal_entity_uuid}"
+        
+    async def create(self, account: Account) -> str:
+        """
+        Create an account.
+        
+        BP accounts linked to a legal entity are written to
+        ``account/BP_{legal_entity_uuid}``; other accounts use their account_uuid.
+        The account_uuid is kept as a field either way.
+        
+        Args:
+            account: Account data object
+            
+        Returns:
+            Document ID of the created account
+        """
+        try:
+            if account.account_type == "BP" and account.legal_entity_uuid:
+                document_id = self.bp_account_document_id(account.legal_entity_uuid)
+            else:
+                document_id = account.account_uuid
+                
+            await self.dao.add_document("account", document_id, account)
+            logger.info(f"Created {account.account_type} account {account.account_uuid} as {document_id}")
+            return document_id
+        except Exception as e:
+            logger.error(f"Error creating account {account.account_uuid}: {str(e)}")
+            raise
+    
     async def get_account_by_uuid(self, account_uuid: str) -> Optional[Account]:
         """
         Get an account by UUID.
@@ -83,6 +124,13 @@ class AccountRepository:
             BP account if found, None otherwise
         """
         try:
+            # Direct get on the legal-entity keyed document
+            account_data = await self.dao.get_document("account", self.bp_account_document_id(legal_entity_uuid))
+            if account_data:
+                return Account(**account_data)
+                
+            # Fall back to querying for accounts stored under their account_uuid.
+            # Temporary: remove once scripts/backfill_bp_account_ids.py has run.
             # Check if legal entity exists first
             legal_entity = await self.dao.get_document("legal_entity", legal_entity_uuid)
             if not legal_entity:
@@ -166,6 +214,58 @@ class AccountRepository:
             logger.error(f"Traceback: {traceback.format_exc()}")
             return None
             
+    async def get_bp_accounts_by_legal_entities(self, legal_entity_uuids: List[str]) -> Dict[str, Account]:
+        """
+        Get the BP accounts for many legal entities at once.
+        
+        Issues one "in" query per chunk of IN_QUERY_LIMIT legal entities and
+        runs the chunks concurrently, instead of one query per legal entity.
+        
+        Args:
+            legal_entity_uuids: UUIDs of the legal entities
+            
+        Returns:
+            Mapping of legal entity UUID to its BP account; legal entities
+            without a BP account are absent
+        """
+        unique_uuids = iter(dict.fromkeys(uuid for uuid in legal_entity_uuids if uuid))
+        chunks = []
+        while True:
+            chunk = list(islice(unique_uuids, IN_QUERY_LIMIT))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            
+        if not chunks:
+            return {}
+            
+        try:
+            results = await asyncio.gather(*[
+                self.dao.query_documents(
+                    "account",
+                    [
+                        ("legal_entity_uuid", "in", chunk),
+                        ("account_type", "==", "BP")
+                    ]
+                )
+                for chunk in chunks
+            ])
+            
+            accounts = {}
+            for account_data_list in results:
+                for account_data in account_data_list:
+                    account_data.pop('document_id', None)
+                    legal_entity_uuid = account_data.get("legal_entity_uuid")
+                    # Keep the first account per legal entity, as the single lookup does
+                    if legal_entity_uuid and legal_entity_uuid not in accounts:
+                        accounts[legal_entity_uuid] = Account(**account_data)
+                        
+            logger.info(f"Found BP accounts for {len(accounts)} of {sum(len(c) for c in chunks)} legal entities")
+            return accounts
+        except Exception as e:
+            logger.error(f"Error getting BP accounts for legal entities: {str(e)}")
+            return {}
+            
     async def get_tds_account(self) -> Optional[Account]:
         """
         Get the TDS account (GL account specifically for TDS).
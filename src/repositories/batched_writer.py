@@ -0,0 +1,60 @@
+"""Helper for sharing a single timestamp across a batch of repository writes."""
+
+import logging
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class BatchedWriter:
+    """
+    Threads one ``now`` timestamp through every create/update call in a batch.
+
+    Repositories such as PaymentAdviceRepository and SettlementRepository accept
+    an optional ``now`` argument; this helper captures it once so all records
+    written together carry identical created_at/updated_at values.
+    """
+
+    def __init__(self, now: Optional[datetime] = None):
+        """
+        Initialize the writer.
+
+        Args:
+            now: Timestamp to use for the batch; defaults to the current UTC time
+        """
+        self.now = now or datetime.utcnow()
+
+    async def create(self, repository: Any, entity: Any) -> str:
+        """
+        Create an entity through the given repository using the batch timestamp.
+
+        Args:
+            repository: Repository exposing ``create(entity, now=...)``
+            entity: Entity data object to create
+
+        Returns:
+            Identifier returned by the repository
+        """
+        return await repository.create(entity, now=self.now)
+
+    async def update(self, repository: Any, uuid: str, updates: Dict[str, Any]) -> None:
+        """
+        Update an entity through the given repository using the batch timestamp.
+
+        Args:
+            repository: Repository exposing ``update(uuid, updates, now=...)``
+            uuid: UUID of the entity
+            updates: Dictionary of fields to update
+        """
+        await repository.update(uuid, updates, now=self.now)
+
+    async def update_status(self, repository: Any, uuid: str, status: Any) -> None:
+        """
+        Update an entity's status through the given repository using the batch timestamp.
+
+        Args:
+            repository: Repository exposing ``update_status(uuid, status, now=...)``
+            uuid: UUID of the entity
+            status: New status enum value
+        """
+        await repository.update_status(uuid, status, now=self.now)
@@ -6,14 +6,17 @@ collections based on the defined schemas. It handles all write operations
 for the transaction and processing metadata tables.
 """
 
+import asyncio
 import os
 import logging
-from typing import Dict, Any, List, Optional, TypeVar, Generic, Type, Union
+from itertools import islice
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, TypeVar, Generic, Type, Union
 from datetime import datetime, date
 from google.cloud import firestore
 from google.cloud import firestore_v1
 from google.cloud.firestore_v1 import AsyncClient
-from dataclasses import asdict, is_dataclass
+from google.cloud.firestore_v1.field_path import FieldPath
+from dataclasses import asdict, is_dataclass, fields
 
 from src.models.schemas import (
     # Master Data
@@ -29,6 +32,12 @@ from src.models.schemas import (
 # Type variable for generic methods
 T = TypeVar('T')
 
+# Maximum number of operations Firestore accepts in a single WriteBatch
+BATCH_WRITE_LIMIT = 500
+
+# Default number of in-flight updates for non-atomic concurrent writes
+CONCURRENT_UPDATE_LIMIT = 32
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -64,6 +73,11 @@ class FirestoreDAO:
     def _convert_to_dict(self, obj: Any) -> Dict[str, Any]:
         """Convert a dataclass object to a dictionary for Firestore."""
         if is_dataclass(obj):
+            # Schema models carry a generated serializer; use it when present
+            serializer = getattr(obj, "_to_firestore_dict", None)
+            if serializer is not None:
+                return serializer()
+            
             data_dict = asdict(obj)
             
             # Convert datetime and date objects to Firestore-compatible formats
@@ -87,7 +101,8 @@ class FirestoreDAO:
         else:
             raise TypeError(f"Object of type {type(obj)} is not supported for Firestore conversion")
 
-    async def add_document(self, collection: str, document_id: str, data: Union[Dict[str, Any], Any]) -> str:
+    async def add_document(self, collection: str, document_id: str, data: Union[Dict[str, Any], Any],
+                           stamp_updated_at: bool = True) -> str:
         """
         Add a document to a collection with a specific ID.
         
@@ -95,6 +110,8 @@ class FirestoreDAO:
             collection: Collection name
             document_id: Document ID
             data: Document data (dict or dataclass)
+            stamp_updated_at: Set updated_at to the server timestamp when the
+                data does not carry one
             
         Returns:
             Document ID
@@ -102,6 +119,8 @@ class FirestoreDAO:
         try:
             collection_ref = self.db.collection(self._get_collection_name(collection))
             data_dict = self._convert_to_dict(data)
+            if stamp_updated_at and data_dict.get('updated_at') is None:
+                data_dict['updated_at'] = firestore.SERVER_TIMESTAMP
             
             doc_ref = collection_ref.document(document_id)
             await doc_ref.set(data_dict)
@@ -112,22 +131,64 @@ class FirestoreDAO:
             logger.error(f"Error adding document to {collection}: {str(e)}")
             raise
 
-    async def update_document(self, collection: str, document_id: str, data: Dict[str, Any]) -> None:
+    def _flatten_field_paths(self, data: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+        """
+        Flatten nested dicts into dotted Firestore field paths.
+        
+        ``{"address": {"city": "X"}}`` becomes ``{"address.city": "X"}`` so an
+        update only touches the leaf fields instead of replacing the whole map.
+        Nested keys are quoted as needed, so keys containing dots or other
+        special characters stay single path segments. Empty dicts are kept as
+        values.
+        """
+        flat = {}
+        for key, value in data.items():
+            path = f"{prefix}{FieldPath(key).to_api_repr()}" if prefix else key
+            if isinstance(value, dict) and value:
+                flat.update(self._flatten_field_paths(value, f"{path}."))
+            else:
+                flat[path] = value
+        return flat
+
+    def _check_schema_fields(self, data: Dict[str, Any], schema: Type) -> None:
+        """Reject update fields whose top-level name is not part of a schema dataclass."""
+        allowed = {f.name for f in fields(schema)}
+        unknown = [key for key in data if key.split(".", 1)[0] not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields for {schema.__name__}: {unknown}")
+
+    async def update_document(self, collection: str, document_id: str, data: Dict[str, Any],
+                              schema: Optional[Type] = None, stamp_updated_at: bool = True,
+                              merge_maps: bool = False) -> None:
         """
         Update an existing document.
         
+        Only the given fields are sent. A map value replaces the whole stored
+        map unless merge_maps is set.
+        
         Args:
             collection: Collection name
             document_id: Document ID
             data: Updated fields
+            schema: Optional schema dataclass; when given, top-level fields
+                that are not part of it are rejected
+            stamp_updated_at: Set updated_at to the server timestamp when the
+                data does not carry one
+            merge_maps: Flatten nested dicts to field paths, so only their leaf
+                fields are written and sibling fields in the same map are kept
         """
         try:
+            if schema is not None:
+                self._check_schema_fields(data, schema)
+            
             doc_ref = self.db.collection(self._get_collection_name(collection)).document(document_id)
             data_dict = self._convert_to_dict(data)
+            if merge_maps:
+                data_dict = self._flatten_field_paths(data_dict)
             
-            # Add updated_at timestamp
-            if 'updated_at' not in data_dict:
-                data_dict['updated_at'] = datetime.utcnow()
+            # Stamp updated_at server-side so no client clock is involved
+            if stamp_updated_at and 'updated_at' not in data_dict:
+                data_dict['updated_at'] = firestore.SERVER_TIMESTAMP
                 
             await doc_ref.update(data_dict)
             logger.info(f"Updated document {document_id} in {collection}")
@@ -136,20 +197,147 @@ class FirestoreDAO:
             logger.error(f"Error updating document {document_id} in {collection}: {str(e)}")
             raise
 
-    async def get_document(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+    async def batch_update_documents(self, collection: str, updates: Dict[str, Dict[str, Any]],
+                                     merge_maps: bool = False) -> int:
+        """
+        Update many documents in a collection using batched writes.
+        
+        Updates are committed in WriteBatch chunks of BATCH_WRITE_LIMIT
+        operations, so each chunk costs one round-trip and is applied atomically.
+        
+        Args:
+            collection: Collection name
+            updates: Mapping of document ID to the fields to update
+            merge_maps: Flatten nested dicts to field paths, as in update_document
+            
+        Returns:
+            Number of documents updated
+        """
+        try:
+            collection_ref = self.db.collection(self._get_collection_name(collection))
+            items = iter(updates.items())
+            updated = 0
+            
+            while True:
+                chunk = list(islice(items, BATCH_WRITE_LIMIT))
+                if not chunk:
+                    break
+                    
+                batch = self.db.batch()
+                for document_id, data in chunk:
+                    data_dict = self._convert_to_dict(data)
+                    if merge_maps:
+                        data_dict = self._flatten_field_paths(data_dict)
+                    if 'updated_at' not in data_dict:
+                        data_dict['updated_at'] = firestore.SERVER_TIMESTAMP
+                    batch.update(collection_ref.document(document_id), data_dict)
+                    
+                await batch.commit()
+                updated += len(chunk)
+                
+            logger.info(f"Batch updated {updated} documents in {collection}")
+            return updated
+            
+        except Exception as e:
+            logger.error(f"Error batch updating documents in {collection}: {str(e)}")
+            raise
+
+    async def batch_write(self, ops: List[Tuple[str, str, str, Any]], schema: Optional[Type] = None,
+                          merge_maps: bool = False) -> None:
+        """
+        Apply several writes atomically in a single WriteBatch commit.
+        
+        Args:
+            ops: List of (op, collection, document_id, data) tuples, where op is
+                "set" (create/overwrite, like add_document), "update" (like
+                update_document) or "delete" (data is ignored); updated_at is
+                stamped when missing
+            schema: Optional schema dataclass; when given, "update" data with
+                top-level fields that are not part of it is rejected
+            merge_maps: Flatten nested dicts of "update" data to field paths,
+                as in update_document
+        """
+        if len(ops) > BATCH_WRITE_LIMIT:
+            raise ValueError(f"A batch accepts at most {BATCH_WRITE_LIMIT} writes, got {len(ops)}")
+            
+        try:
+            batch = self.db.batch()
+            for op, collection, document_id, data in ops:
+                doc_ref = self.db.collection(self._get_collection_name(collection)).document(document_id)
+                if op == "delete":
+                    batch.delete(doc_ref)
+                    continue
+                if op == "update" and schema is not None:
+                    self._check_schema_fields(data, schema)
+                data_dict = self._convert_to_dict(data)
+                if op == "set":
+                    if data_dict.get('updated_at') is None:
+                        data_dict['updated_at'] = firestore.SERVER_TIMESTAMP
+                    batch.set(doc_ref, data_dict)
+                elif op == "update":
+                    if merge_maps:
+                        data_dict = self._flatten_field_paths(data_dict)
+                    if 'updated_at' not in data_dict:
+                        data_dict['updated_at'] = firestore.SERVER_TIMESTAMP
+                    batch.update(doc_ref, data_dict)
+                else:
+                    raise ValueError(f"Unsupported batch operation: {op}")
+                    
+            await batch.commit()
+            logger.info(f"Committed batch of {len(ops)} writes")
+            
+        except Exception as e:
+            logger.error(f"Error committing batch write: {str(e)}")
+            raise
+
+    async def update_documents_concurrently(self, collection: str, updates: Dict[str, Dict[str, Any]],
+                                            max_concurrency: int = CONCURRENT_UPDATE_LIMIT) -> int:
+        """
+        Update many documents with individual, concurrently issued writes.
+        
+        Non-atomic alternative to batch_update_documents: each document is
+        updated on its own, with at most max_concurrency writes in flight, and
+        a failed write does not stop the others.
+        
+        Args:
+            collection: Collection name
+            updates: Mapping of document ID to the fields to update
+            max_concurrency: Maximum number of concurrent writes
+            
+        Returns:
+            Number of documents updated successfully
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _update(document_id: str, data: Dict[str, Any]) -> None:
+            async with semaphore:
+                await self.update_document(collection, document_id, data)
+                
+        results = await asyncio.gather(
+            *(_update(document_id, data) for document_id, data in updates.items()),
+            return_exceptions=True
+        )
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        if failed:
+            logger.warning(f"{failed} of {len(results)} concurrent updates failed in {collection}")
+        return len(results) - failed
+
+    async def get_document(self, collection: str, document_id: str,
+                           select: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
         """
         Get a document by ID.
         
         Args:
             collection: Collection name
             document_id: Document ID
+            select: Optional field paths to project; only these fields are returned
             
         Returns:
             Document data or None if not found
         """
         try:
             doc_ref = self.db.collection(self._get_collection_name(collection)).document(document_id)
-            doc = await doc_ref.get()
+            doc = await doc_ref.get(field_paths=select) if select else await doc_ref.get()
             
             if doc.exists:
                 return doc.to_dict()
@@ -162,7 +350,8 @@ class FirestoreDAO:
             raise
 
     async def query_documents(self, collection: str, filters: List[tuple] = None, 
-                              order_by: str = None, limit: int = None, desc: bool = False) -> List[Dict[str, Any]]:
+                              order_by: str = None, limit: int = None, desc: bool = False,
+                              select: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Query documents with filters.
         
@@ -171,6 +360,7 @@ class FirestoreDAO:
             filters: List of (field, operator, value) tuples
             order_by: Field to order by
             limit: Maximum number of results
+            select: Optional field paths to project; only these fields are returned
             
         Returns:
             List of document dictionaries
@@ -181,6 +371,9 @@ class FirestoreDAO:
             if filters:
                 for field, op, value in filters:
                     query = query.where(field, op, value)
+                    
+            if select:
+                query = query.select(select)
             
             if order_by:
                 # Apply descending order if specified
@@ -207,6 +400,109 @@ class FirestoreDAO:
             logger.error(f"Error querying {collection}: {str(e)}")
             raise
 
+    async def stream_documents(self, collection: str, filters: List[tuple] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream documents matching filters one at a time.
+        
+        Documents are yielded as Firestore returns them, so callers that stop
+        early never read or convert the remaining results.
+        
+        Args:
+            collection: Collection name
+            filters: List of (field, operator, value) tuples
+            
+        Yields:
+            Document dictionaries
+        """
+        try:
+            query = self.db.collection(self._get_collection_name(collection))
+            
+            if filters:
+                for field, op, value in filters:
+                    query = query.where(field, op, value)
+                    
+            async for doc in query.stream():
+                doc_data = doc.to_dict()
+                doc_data['document_id'] = doc.id
+                yield doc_data
+                
+        except Exception as e:
+            logger.error(f"Error streaming {collection}: {str(e)}")
+            raise
+
+    async def query_documents_page(self, collection: str, filters: List[tuple] = None,
+                                   page_size: int = 100, start_after: Any = None
+                                   ) -> Tuple[List[Dict[str, Any]], Optional[Any]]:
+        """
+        Query one page of documents with filters.
+        
+        Args:
+            collection: Collection name
+            filters: List of (field, operator, value) tuples
+            page_size: Maximum number of documents in the page
+            start_after: Cursor returned by the previous page, or None for the first page
+            
+        Returns:
+            Tuple of (document dictionaries, cursor for the next page). The
+            cursor is None once the last page has been returned.
+        """
+        try:
+            query = self.db.collection(self._get_collection_name(collection))
+            
+            if filters:
+                for field, op, value in filters:
+                    query = query.where(field, op, value)
+                    
+            if start_after is not None:
+                query = query.start_after(start_after)
+            query = query.limit(page_size)
+            
+            results = []
+            last_snapshot = None
+            async for doc in query.stream():
+                doc_data = doc.to_dict()
+                doc_data['document_id'] = doc.id
+                results.append(doc_data)
+                last_snapshot = doc
+                
+            # A short page means there is nothing left to fetch
+            next_cursor = last_snapshot if len(results) == page_size else None
+            logger.info(f"Query page returned {len(results)} results from {collection}")
+            return results, next_cursor
+            
+        except Exception as e:
+            logger.error(f"Error querying page of {collection}: {str(e)}")
+            raise
+
+    async def list_documents(self, collection: str) -> List[Dict[str, Any]]:
+        """
+        List every document in a collection or subcollection.
+
+        Unlike query_documents this applies no filters, so streaming a
+        subcollection such as ``payment_advice/{uuid}/invoice`` needs no index.
+
+        Args:
+            collection: Collection name or slash-separated subcollection path
+
+        Returns:
+            List of document dictionaries
+        """
+        try:
+            collection_ref = self.db.collection(self._get_collection_name(collection))
+
+            results = []
+            async for doc in collection_ref.stream():
+                doc_data = doc.to_dict()
+                doc_data['document_id'] = doc.id
+                results.append(doc_data)
+
+            logger.info(f"Listed {len(results)} documents from {collection}")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error listing {collection}: {str(e)}")
+            raise
+
     async def delete_document(self, collection: str, document_id: str) -> None:
         """
         Delete a document by ID.
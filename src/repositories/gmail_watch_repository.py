@@ -5,6 +5,7 @@ This module provides repository classes for managing Gmail watch status
 in Firestore. It abstracts database interactions for Gmail watch operations.
 """
 
+import asyncio
 import logging
 import uuid
 from datetime import datetime
@@ -117,27 +118,38 @@ class GmailWatchRepository:
             if existing_watch and "refresh_count" in existing_watch:
                 watch_data["refresh_count"] = existing_watch["refresh_count"] + 1
             
-            # Update current status - use add_document which can create or overwrite documents
-            await self.dao.add_document(
-                self.WATCH_STATUS_COLLECTION,
-                self.CURRENT_STATUS_DOC_ID,
-                watch_data
-            )
-            
             # Also add to history collection for audit trail
             history_id = str(uuid.uuid4())
+            # Store only a reference to the current status doc; the remaining
+            # watch fields are already persisted there
             history_data = {
-                **watch_data,  # Include all watch data
+                "ref": f"{self.WATCH_STATUS_COLLECTION}/{self.CURRENT_STATUS_DOC_ID}",
+                "refresh_count": watch_data["refresh_count"],
                 "timestamp": current_time,  # When this history entry was created
                 "operation": "refresh"
             }
             
-            await self.dao.add_document(
-                self.WATCH_HISTORY_COLLECTION,
-                history_id,
-                history_data
+            # Write the current status and the history entry concurrently.
+            # add_document can create or overwrite documents.
+            status_result, history_result = await asyncio.gather(
+                self.dao.add_document(
+                    self.WATCH_STATUS_COLLECTION,
+                    self.CURRENT_STATUS_DOC_ID,
+                    watch_data
+                ),
+                self.dao.add_document(
+                    self.WATCH_HISTORY_COLLECTION,
+                    history_id,
+                    history_data
+                ),
+                return_exceptions=True
             )
             
+            if isinstance(status_result, Exception):
+                raise status_result
+            if isinstance(history_result, Exception):
+                logger.warning(f"Gmail watch status saved but history entry failed: {str(history_result)}")
+            
             logger.info(f"Gmail watch status saved to Firestore. Refresh #{watch_data['refresh_count']}")
             return watch_data
             
@@ -17,6 +17,11 @@ class InvoiceRepository:
         """Initialize with a FirestoreDAO instance."""
         self.dao = dao
         
+    @staticmethod
+    def _nested_collection(payment_advice_uuid: str) -> str:
+        """Path of the invoice subcollection under a payment advice."""
+        return f"payment_advice/{payment_advice_uuid}/invoice"
+        
     async def create(self, invoice: Invoice) -> str:
         """
         Create a new invoice record.
@@ -39,8 +44,13 @@ class InvoiceRepository:
             # Set updated timestamp
             invoice.updated_at = datetime.utcnow()
             
-            # Add to Firestore
-            await self.dao.add_document("invoice", invoice.invoice_uuid, invoice)
+            # Add to Firestore. During the migration to the payment advice
+            # subcollection layout, write both the top-level and nested copies
+            # in one batch so they cannot drift apart.
+            await self.dao.batch_write([
+                ("set", "invoice", invoice.invoice_uuid, invoice),
+                ("set", self._nested_collection(invoice.payment_advice_uuid), invoice.invoice_uuid, invoice)
+            ])
             logger.info(f"Created invoice {invoice.invoice_uuid} for payment advice {invoice.payment_advice_uuid}")
             return invoice.invoice_uuid
             
@@ -79,10 +89,14 @@ class InvoiceRepository:
             List of Invoice objects
         """
         try:
-            docs = await self.dao.query_documents(
-                "invoice", 
-                filters=[("payment_advice_uuid", "==", payment_advice_uuid)]
-            )
+            # Listing the subcollection needs no index; fall back to the
+            # top-level query for payment advices written before the migration
+            docs = await self.dao.list_documents(self._nested_collection(payment_advice_uuid))
+            if not docs:
+                docs = await self.dao.query_documents(
+                    "invoice", 
+                    filters=[("payment_advice_uuid", "==", payment_advice_uuid)]
+                )
             return [Invoice(**doc) for doc in docs]
             
         except Exception as e:
@@ -110,35 +124,44 @@ class InvoiceRepository:
             logger.error(f"Error retrieving invoices with number {invoice_number}: {str(e)}")
             raise
             
-    async def update(self, invoice_uuid: str, updates: Dict[str, Any]) -> None:
+    async def update(self, invoice_uuid: str, updates: Dict[str, Any], payment_advice_uuid: str) -> None:
         """
         Update an invoice with new data.
         
+        The top-level document and its copy nested under the payment advice
+        are updated in one batch. Invoices written before the subcollection
+        layout need scripts/backfill_nested_payment_advice_docs.py run first.
+        
         Args:
             invoice_uuid: UUID of the invoice
             updates: Dictionary of fields to update
+            payment_advice_uuid: UUID of the parent payment advice
         """
         try:
-            # Always update the updated_at timestamp
-            if "updated_at" not in updates:
-                updates["updated_at"] = datetime.utcnow()
-                
-            await self.dao.update_document("invoice", invoice_uuid, updates)
+            # updated_at is stamped by the DAO when not given
+            await self.dao.batch_write([
+                ("update", "invoice", invoice_uuid, updates),
+                ("update", self._nested_collection(payment_advice_uuid), invoice_uuid, updates)
+            ], schema=Invoice)
             logger.info(f"Updated invoice {invoice_uuid} with {len(updates)} fields")
             
         except Exception as e:
             logger.error(f"Error updating invoice {invoice_uuid}: {str(e)}")
             raise
             
-    async def delete(self, invoice_uuid: str) -> None:
+    async def delete(self, invoice_uuid: str, payment_advice_uuid: str) -> None:
         """
-        Delete an invoice.
+        Delete an invoice, together with its copy nested under the payment advice.
         
         Args:
             invoice_uuid: UUID of the invoice
+            payment_advice_uuid: UUID of the parent payment advice
         """
         try:
-            await self.dao.delete_document("invoice", invoice_uuid)
+            await self.dao.batch_write([
+                ("delete", "invoice", invoice_uuid, None),
+                ("delete", self._nested_collection(payment_advice_uuid), invoice_uuid, None)
+            ])
             logger.info(f"Deleted invoice {invoice_uuid}")
             
         except Exception as e:
@@ -1,12 +1,91 @@
 """Legal entity repository for database operations."""
 
+import asyncio
 import logging
+import re
+import string
+import time
 from typing import List, Dict, Any, Optional
 
+from src.config import LEGAL_ENTITY_CACHE_TTL_SECONDS
 from src.repositories.firestore_dao import FirestoreDAO
 
+__all__ = ["LegalEntityRepository"]
+
 logger = logging.getLogger(__name__)
 
+# Maximum number of fuzzy name resolutions (matches and misses alike)
+# remembered between catalog reloads
+FUZZY_MATCH_CACHE_MAXSIZE = 1024
+
+# Punctuation is folded to spaces and whitespace runs collapsed, so names such
+# as "Pvt. Ltd." and "Pvt Ltd" share a cache key
+_PUNCTUATION_TO_SPACE = str.maketrans({c: " " for c in string.punctuation})
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_name(name: str) -> str:
+    """Normalize a legal entity name for case/punctuation-insensitive lookup."""
+    return _WHITESPACE_RE.sub(" ", name.translate(_PUNCTUATION_TO_SPACE)).strip().lower()
+
+
+def _trigrams(text: str) -> set:
+    """Return the set of 3-character shingles of a string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _TrigramIndex:
+    """
+    Inverted index from trigrams to key positions, for fuzzy containment matching.
+    
+    A key can only contain the needle, or be contained in it, if it shares a
+    trigram with the needle or is shorter than three characters, so only those
+    keys need the substring check.
+    """
+    
+    def __init__(self, keys: List[str]):
+        self._postings: Dict[str, List[int]] = {}
+        self._short_keys: List[int] = []
+        for idx, key in enumerate(keys):
+            grams = _trigrams(key)
+            if not grams:
+                self._short_keys.append(idx)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(idx)
+        self._size = len(keys)
+        
+    def candidates(self, needle: str) -> List[int]:
+        """Return the positions of keys that may match the needle, in key order."""
+        grams = _trigrams(needle)
+        if not grams:
+            # A needle this short can be contained in any key
+            return list(range(self._size))
+        found = set(self._short_keys)
+        for gram in grams:
+            found.update(self._postings.get(gram, ()))
+        return sorted(found)
+
+
+def _find_fuzzy_match(keys: List[str], needle: str, index: Optional[_TrigramIndex] = None) -> Optional[int]:
+    """
+    Find the first key that contains, or is contained by, the needle.
+    
+    Args:
+        keys: Normalized cache keys, in cache insertion order
+        needle: Normalized name to match
+        index: Optional trigram index over keys, to skip keys that cannot match
+        
+    Returns:
+        Index of the matching key, or None if nothing matches
+    """
+    positions = index.candidates(needle) if index is not None else range(len(keys))
+    for idx in positions:
+        key = keys[idx]
+        if needle in key or key in needle:
+            return idx
+    return None
+
+
 class LegalEntityRepository:
     """Repository for legal entity database operations."""
     
@@ -19,12 +98,32 @@ class LegalEntityRepository:
         """
         self.dao = dao
         self._cache = {}
+        self._fuzzy_keys: List[str] = []
+        self._fuzzy_index = _TrigramIndex([])
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        # Fuzzy matches by normalized name; only valid for the loaded catalog
+        self._fuzzy_matches: Dict[str, Dict[str, Any]] = {}
+        # Names known not to match anything in the loaded catalog (ordered set)
+        self._unmatched_names: Dict[str, None] = {}
+        self._entities: List[Dict[str, Any]] = []
+        self._loaded_at: Optional[float] = None
+        # Catalog load in progress, shared by concurrent callers
+        self._load_task: Optional[asyncio.Task] = None
         self._entities_loaded = False
+        # Bumped on every successful reload so callers can tell when indices
+        # they derived from the catalog are stale
+        self.version = 0
         
-    async def fetch_all_legal_entities(self) -> List[Dict[str, Any]]:
+    async def fetch_all_legal_entities(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """
         Fetch all legal entities from Firestore.
         
+        The catalog is small and rarely changes, so a loaded copy is served
+        from memory for LEGAL_ENTITY_CACHE_TTL_SECONDS before re-querying.
+        
+        Args:
+            force_refresh: Re-query Firestore even if the cached copy is fresh
+            
         Returns:
             List of legal entity objects
         """
@@ -32,6 +131,38 @@ class LegalEntityRepository:
             logger.error("No DAO provided, cannot fetch legal entities")
             return []
             
+        if (not force_refresh and self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < LEGAL_ENTITY_CACHE_TTL_SECONDS):
+            return self._entities
+            
+        # Concurrent callers on a cold or expired cache share one Firestore query
+        load_task = self._load_task
+        if load_task is None:
+            load_task = self._load_task = asyncio.ensure_future(self._load_legal_entities())
+            load_task.add_done_callback(self._clear_load_task)
+        return await asyncio.shield(load_task)
+        
+    async def refresh(self) -> List[Dict[str, Any]]:
+        """
+        Reload the legal entity catalog now, regardless of the cache TTL.
+        
+        Returns:
+            List of legal entity objects
+        """
+        return await self.fetch_all_legal_entities(force_refresh=True)
+        
+    def _clear_load_task(self, task: asyncio.Task) -> None:
+        """Forget a finished catalog load so the next expiry starts a new one."""
+        if self._load_task is task:
+            self._load_task = None
+            
+    async def _load_legal_entities(self) -> List[Dict[str, Any]]:
+        """
+        Query all legal entities from Firestore and rebuild the lookup indices.
+        
+        Returns:
+            List of legal entity objects, or an empty list on failure
+        """
         try:
             # Fetch legal entities directly from Firestore
             legal_entities = await self.dao.query_documents("legal_entity", [])
@@ -41,23 +172,37 @@ class LegalEntityRepository:
             self._cache = {}
             for entity in legal_entities:
                 name = entity.get("legal_entity_name")
-                if name:
-                    # Store in cache with lowercase key for case-insensitive lookup
-                    self._cache[name.lower()] = entity
+                key = _normalize_name(name) if name else ""
+                if key:
+                    # Store in cache with a normalized key for case-insensitive lookup
+                    self._cache[key] = entity
                     
                 # Also cache alternate names if present
                 alternate_names = entity.get("alternate_names", [])
                 for alt_name in alternate_names:
                     if alt_name and isinstance(alt_name, str):
-                        self._cache[alt_name.lower()] = entity
+                        key = _normalize_name(alt_name)
+                        if key:
+                            self._cache[key] = entity
                     
+            # Snapshot the keys once so fuzzy lookups scan a flat list
+            self._fuzzy_keys = list(self._cache)
+            self._fuzzy_index = _TrigramIndex(self._fuzzy_keys)
+            self._fuzzy_matches = {}
+            self._unmatched_names = {}
+            self._by_id = {
+                entity["legal_entity_uuid"]: entity
+                for entity in legal_entities
+                if entity.get("legal_entity_uuid")
+            }
+            self._entities = legal_entities
+            self._loaded_at = time.monotonic()
             self._entities_loaded = True
+            self.version += 1
             logger.info(f"Legal entities loaded into cache with {len(self._cache)} total keys (including alternate names)")
             return legal_entities
         except Exception as e:
-            logger.error(f"Error in fetch_all_legal_entities: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error in fetch_all_legal_entities: %s", e)
             return []
     
     async def get_legal_entity_by_name(self, name: str) -> Optional[Dict[str, Any]]:
@@ -74,8 +219,8 @@ class LegalEntityRepository:
         if not self._entities_loaded:
             await self.fetch_all_legal_entities()
             
-        # Normalize name for case-insensitive comparison
-        normalized_name = name.lower() if name else ""
+        # Normalize name for case- and punctuation-insensitive comparison
+        normalized_name = _normalize_name(name) if name else ""
         
         if not normalized_name:
             logger.warning("Empty name provided to get_legal_entity_by_name")
@@ -87,13 +232,90 @@ class LegalEntityRepository:
             logger.info(f"Found exact match for '{name}'")
             return entity
             
+        # Reuse an earlier fuzzy match, or miss, for the same name
+        entity = self._fuzzy_matches.get(normalized_name)
+        if entity:
+            return entity
+        if normalized_name in self._unmatched_names:
+            logger.debug("Legal entity name '%s' is known not to match", name)
+            return None
+            
         # Try fuzzy matching if exact match fails
         logger.info(f"No exact match for '{name}', trying fuzzy matching")
-        for cache_name, cache_entity in self._cache.items():
-            # Check if the name contains or is contained by any cached name
-            if normalized_name in cache_name or cache_name in normalized_name:
-                logger.info(f"Found fuzzy match: '{name}' ~ '{cache_entity.get('legal_entity_name')}' (matched on '{cache_name}')")
-                return cache_entity
+        match_idx = _find_fuzzy_match(self._fuzzy_keys, normalized_name, self._fuzzy_index)
+        if match_idx is not None:
+            cache_name = self._fuzzy_keys[match_idx]
+            cache_entity = self._cache[cache_name]
+            logger.info(f"Found fuzzy match: '{name}' ~ '{cache_entity.get('legal_entity_name')}' (matched on '{cache_name}')")
+            if len(self._fuzzy_matches) >= FUZZY_MATCH_CACHE_MAXSIZE:
+                # Evict the oldest insertion
+                del self._fuzzy_matches[next(iter(self._fuzzy_matches))]
+            self._fuzzy_matches[normalized_name] = cache_entity
+            return cache_entity
                 
         logger.warning(f"No match found for legal entity name: '{name}'")
+        if len(self._unmatched_names) >= FUZZY_MATCH_CACHE_MAXSIZE:
+            del self._unmatched_names[next(iter(self._unmatched_names))]
+        self._unmatched_names[normalized_name] = None
         return None
+    
+    async def find_legal_entities_in_text(self, text: str,
+                                          include_alternate_names: bool = True) -> List[Dict[str, Any]]:
+        """
+        Find the legal entities whose name or an alternate name appears in a text.
+        
+        Names are matched on whole words after normalization, so "Acme Corp"
+        is found in "ACME CORP. remittance" but not in "Acme Corporation".
+        
+        Args:
+            text: Text to search, e.g. document text
+            include_alternate_names: Also match alternate names, not just full
+                legal entity names
+            
+        Returns:
+            Distinct legal entity objects mentioned in the text
+        """
+        if not self._entities_loaded:
+            await self.fetch_all_legal_entities()
+            
+        haystack = f" {_normalize_name(text)} "
+        mentioned = {}
+        if include_alternate_names:
+            for key in self._fuzzy_keys:
+                if f" {key} " in haystack:
+                    entity = self._cache[key]
+                    mentioned.setdefault(entity.get("legal_entity_uuid"), entity)
+        else:
+            for entity in self._entities:
+                name = entity.get("legal_entity_name")
+                key = _normalize_name(name) if name else ""
+                if key and f" {key} " in haystack:
+                    mentioned.setdefault(entity.get("legal_entity_uuid"), entity)
+        return list(mentioned.values())
+    
+    async def get_legal_entity_by_id(self, legal_entity_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        Get legal entity by its UUID.
+        
+        Callers that already know the entity's UUID should use this instead of
+        get_legal_entity_by_name, which may fall through to fuzzy matching.
+        Served from the UUID index once the catalog is loaded; otherwise the
+        single document is fetched directly rather than loading the catalog.
+        
+        Args:
+            legal_entity_uuid: Legal entity UUID to look up
+            
+        Returns:
+            Legal entity object if found, None otherwise
+        """
+        if not self._entities_loaded:
+            try:
+                return await self.dao.get_document("legal_entity", legal_entity_uuid)
+            except Exception as e:
+                logger.error(f"Error getting legal entity {legal_entity_uuid}: {str(e)}")
+                return None
+            
+        entity = self._by_id.get(legal_entity_uuid)
+        if not entity:
+            logger.warning(f"No legal entity found with UUID: '{legal_entity_uuid}'")
+        return entity
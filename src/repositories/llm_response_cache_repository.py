@@ -0,0 +1,89 @@
+"""Repository for cached LLM extraction responses in Firestore."""
+
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from src.config import LLM_RESPONSE_CACHE_TTL_DAYS
+from src.repositories.firestore_dao import FirestoreDAO
+
+logger = logging.getLogger(__name__)
+
+class LLMResponseCacheRepository:
+    """
+    Content-addressed cache of LLM responses.
+    
+    Entries are keyed by a SHA-256 of everything that determines the response
+    (model, temperature, system prompt and user content), so reprocessing the
+    same document with the same prompt skips the LLM call. Entries carry an
+    expires_at timestamp, which a Firestore TTL policy can use to delete them.
+    """
+    
+    COLLECTION = "llm_response_cache"
+    
+    def __init__(self, dao: FirestoreDAO, ttl_days: int = LLM_RESPONSE_CACHE_TTL_DAYS):
+        """
+        Initialize the repository.
+        
+        Args:
+            dao: Firestore DAO for database operations
+            ttl_days: Days a cached response stays valid
+        """
+        self.dao = dao
+        self.ttl = timedelta(days=ttl_days)
+        
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Return the cache key for the given request parts."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+        
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response.
+        
+        Args:
+            key: Cache key from make_key
+            
+        Returns:
+            The cached response text, or None on a miss, expiry or error
+        """
+        try:
+            doc = await self.dao.get_document(self.COLLECTION, key)
+            if not doc:
+                return None
+                
+            # TTL deletion is not immediate, so check expiry on read too
+            expires_at = doc.get("expires_at")
+            if expires_at and expires_at <= datetime.now(timezone.utc):
+                return None
+                
+            return doc.get("response_text")
+        except Exception as e:
+            # A cache failure only costs the LLM call it would have saved
+            logger.warning(f"Error reading LLM response cache entry {key}: {str(e)}")
+            return None
+            
+    async def put(self, key: str, response_text: str, model: str) -> None:
+        """
+        Store a response.
+        
+        Args:
+            key: Cache key from make_key
+            response_text: Response text returned by the LLM
+            model: Model that produced the response
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            await self.dao.add_document(self.COLLECTION, key, {
+                "response_text": response_text,
+                "model": model,
+                "created_at": now,
+                "expires_at": now + self.ttl
+            }, stamp_updated_at=False)
+        except Exception as e:
+            logger.warning(f"Error writing LLM response cache entry {key}: {str(e)}")
@@ -17,6 +17,11 @@ class OtherDocRepository:
         """Initialize with a FirestoreDAO instance."""
         self.dao = dao
         
+    @staticmethod
+    def _nested_collection(payment_advice_uuid: str) -> str:
+        """Path of the other doc subcollection under a payment advice."""
+        return f"payment_advice/{payment_advice_uuid}/other_doc"
+        
     async def create(self, other_doc: OtherDoc) -> str:
         """
         Create a new other document record.
@@ -39,8 +44,13 @@ class OtherDocRepository:
             # Set updated timestamp
             other_doc.updated_at = datetime.utcnow()
             
-            # Add to Firestore
-            await self.dao.add_document("other_doc", other_doc.other_doc_uuid, other_doc)
+            # Add to Firestore. During the migration to the payment advice
+            # subcollection layout, write both the top-level and nested copies
+            # in one batch so they cannot drift apart.
+            await self.dao.batch_write([
+                ("set", "other_doc", other_doc.other_doc_uuid, other_doc),
+                ("set", self._nested_collection(other_doc.payment_advice_uuid), other_doc.other_doc_uuid, other_doc)
+            ])
             logger.info(f"Created other doc {other_doc.other_doc_uuid} for payment advice {other_doc.payment_advice_uuid}")
             return other_doc.other_doc_uuid
             
@@ -79,10 +89,14 @@ class OtherDocRepository:
             List of OtherDoc objects
         """
         try:
-            docs = await self.dao.query_documents(
-                "other_doc", 
-                filters=[("payment_advice_uuid", "==", payment_advice_uuid)]
-            )
+            # Listing the subcollection needs no index; fall back to the
+            # top-level query for payment advices written before the migration
+            docs = await self.dao.list_documents(self._nested_collection(payment_advice_uuid))
+            if not docs:
+                docs = await self.dao.query_documents(
+                    "other_doc", 
+                    filters=[("payment_advice_uuid", "==", payment_advice_uuid)]
+                )
             return [OtherDoc(**doc) for doc in docs]
             
         except Exception as e:
@@ -110,35 +124,44 @@ class OtherDocRepository:
             logger.error(f"Error retrieving other docs with number {other_doc_number}: {str(e)}")
             raise
             
-    async def update(self, other_doc_uuid: str, updates: Dict[str, Any]) -> None:
+    async def update(self, other_doc_uuid: str, updates: Dict[str, Any], payment_advice_uuid: str) -> None:
         """
         Update an other doc with new data.
         
+        The top-level document and its copy nested under the payment advice
+        are updated in one batch. Other docs written before the subcollection
+        layout need scripts/backfill_nested_payment_advice_docs.py run first.
+        
         Args:
             other_doc_uuid: UUID of the other doc
             updates: Dictionary of fields to update
+            payment_advice_uuid: UUID of the parent payment advice
         """
         try:
-            # Always update the updated_at timestamp
-            if "updated_at" not in updates:
-                updates["updated_at"] = datetime.utcnow()
-                
-            await self.dao.update_document("other_doc", other_doc_uuid, updates)
+            # updated_at is stamped by the DAO when not given
+            await self.dao.batch_write([
+                ("update", "other_doc", other_doc_uuid, updates),
+                ("update", self._nested_collection(payment_advice_uuid), other_doc_uuid, updates)
+            ], schema=OtherDoc)
             logger.info(f"Updated other doc {other_doc_uuid} with {len(updates)} fields")
             
         except Exception as e:
             logger.error(f"Error updating other doc {other_doc_uuid}: {str(e)}")
             raise
             
-    async def delete(self, other_doc_uuid: str) -> None:
+    async def delete(self, other_doc_uuid: str, payment_advice_uuid: str) -> None:
         """
-        Delete an other doc.
+        Delete an other doc, together with its copy nested under the payment advice.
         
         Args:
             other_doc_uuid: UUID of the other doc
+            payment_advice_uuid: UUID of the parent payment advice
         """
         try:
-            await self.dao.delete_document("other_doc", other_doc_uuid)
+            await self.dao.batch_write([
+                ("delete", "other_doc", other_doc_uuid, None),
+                ("delete", self._nested_collection(payment_advice_uuid), other_doc_uuid, None)
+            ])
             logger.info(f"Deleted other doc {other_doc_uuid}")
             
         except Exception as e:
@@ -1,7 +1,7 @@
 """Repository for PaymentAdvice entity operations."""
 
 import logging
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
 from datetime import datetime
 from uuid import uuid4
 
@@ -10,6 +10,12 @@ from src.repositories.firestore_dao import FirestoreDAO
 
 logger = logging.getLogger(__name__)
 
+def _to_payment_advices(docs: List[Dict[str, Any]]) -> List[PaymentAdvice]:
+    """Build PaymentAdvice objects from query results, dropping the DAO's document_id key."""
+    for doc in docs:
+        doc.pop("document_id", None)
+    return [PaymentAdvice(**doc) for doc in docs]
+
 class PaymentAdviceRepository:
     """Repository for PaymentAdvice data operations."""
     
@@ -17,27 +23,32 @@ class PaymentAdviceRepository:
         """Initialize with a FirestoreDAO instance."""
         self.dao = dao
         
-    async def create(self, payment_advice: PaymentAdvice) -> str:
+    async def create(self, payment_advice: PaymentAdvice, now: Optional[datetime] = None) -> str:
         """
         Create a new payment advice record.
         
         Args:
             payment_advice: PaymentAdvice data object
+            now: Optional timestamp shared across a batch of writes; defaults
+                to the current UTC time
             
         Returns:
             payment_advice_uuid: The UUID of the created payment advice
         """
         try:
+            if now is None:
+                now = datetime.utcnow()
+                
             # Generate UUID if not already set
             if not payment_advice.payment_advice_uuid:
                 payment_advice.payment_advice_uuid = str(uuid4())
                 
             # Set creation timestamp if not set
             if not payment_advice.created_at:
-                payment_advice.created_at = datetime.utcnow()
+                payment_advice.created_at = now
                 
             # Set updated timestamp
-            payment_advice.updated_at = datetime.utcnow()
+            payment_advice.updated_at = now
             
             # Add to Firestore
             await self.dao.add_document("payment_advice", payment_advice.payment_advice_uuid, payment_advice)
@@ -83,12 +94,59 @@ class PaymentAdviceRepository:
                 "payment_advice", 
                 filters=[("email_log_uuid", "==", email_log_uuid)]
             )
-            return [PaymentAdvice(**doc) for doc in docs]
+            return _to_payment_advices(docs)
+            
+        except Exception as e:
+            logger.error(f"Error retrieving payment advices for email log {email_log_uuid}: {str(e)}")
+            raise
+            
+    async def get_page_by_email_log(self, email_log_uuid: str, page_size: int = 100,
+                                    start_after: Optional[Any] = None) -> Tuple[List[PaymentAdvice], Optional[Any]]:
+        """
+        Get one page of the payment advices for a specific email log.
+        
+        Pass the returned cursor as start_after to fetch the next page.
+        
+        Args:
+            email_log_uuid: UUID of the email log
+            page_size: Maximum number of objects in the page
+            start_after: Cursor returned with the previous page, or None to
+                start at the first page
+            
+        Returns:
+            Tuple of (PaymentAdvice objects in this page, cursor for the next
+            page, or None when this is the last page)
+        """
+        try:
+            docs, next_cursor = await self.dao.query_documents_page(
+                "payment_advice", 
+                filters=[("email_log_uuid", "==", email_log_uuid)],
+                page_size=page_size,
+                start_after=start_after
+            )
+            return _to_payment_advices(docs), next_cursor
             
         except Exception as e:
             logger.error(f"Error retrieving payment advices for email log {email_log_uuid}: {str(e)}")
             raise
             
+    async def iter_by_email_log(self, email_log_uuid: str) -> AsyncIterator[PaymentAdvice]:
+        """
+        Lazily iterate over the payment advices of an email log.
+        
+        Results are streamed and converted one at a time, so callers that only
+        need the first match do not pay for the rest.
+        
+        Args:
+            email_log_uuid: UUID of the email log
+            
+        Yields:
+            PaymentAdvice objects
+        """
+        async for doc in self.dao.stream_documents("payment_advice", filters=[("email_log_uuid", "==", email_log_uuid)]):
+            doc.pop("document_id", None)
+            yield PaymentAdvice(**doc)
+            
     async def get_by_status(self, status: PaymentAdviceStatus) -> List[PaymentAdvice]:
         """
         Get payment advices by status.
@@ -104,24 +162,61 @@ class PaymentAdviceRepository:
                 "payment_advice", 
                 filters=[("payment_advice_status", "==", status.value)]
             )
-            return [PaymentAdvice(**doc) for doc in docs]
+            return _to_payment_advices(docs)
             
         except Exception as e:
             logger.error(f"Error retrieving payment advices with status {status}: {str(e)}")
             raise
             
-    async def update(self, payment_advice_uuid: str, updates: Dict[str, Any]) -> None:
+    async def get_page_by_status(self, status: PaymentAdviceStatus, page_size: int = 100,
+                                 start_after: Optional[Any] = None) -> Tuple[List[PaymentAdvice], Optional[Any]]:
+        """
+        Get one page of the payment advices with a status.
+        
+        Pass the returned cursor as start_after to fetch the next page.
+        
+        Args:
+            status: PaymentAdviceStatus enum value
+            page_size: Maximum number of objects in the page
+            start_after: Cursor returned with the previous page, or None to
+                start at the first page
+            
+        Returns:
+            Tuple of (PaymentAdvice objects in this page, cursor for the next
+            page, or None when this is the last page)
+        """
+        try:
+            docs, next_cursor = await self.dao.query_documents_page(
+                "payment_advice", 
+                filters=[("payment_advice_status", "==", status.value)],
+                page_size=page_size,
+                start_after=start_after
+            )
+            return _to_payment_advices(docs), next_cursor
+            
+        except Exception as e:
+            logger.error(f"Error retrieving payment advices with status {status}: {str(e)}")
+            raise
+            
+    async def update(self, payment_advice_uuid: str, updates: Dict[str, Any],
+                     now: Optional[datetime] = None) -> None:
         """
         Update a payment advice with new data.
         
         Args:
             payment_advice_uuid: UUID of the payment advice
             updates: Dictionary of fields to update
+            now: Optional timestamp shared across a batch of writes; when
+                omitted the DAO stamps updated_at with the server timestamp
         """
         try:
-            # Always update the updated_at timestamp
-            if "updated_at" not in updates:
-                updates["updated_at"] = datetime.utcnow()
+            # Nothing to write besides the timestamp; skip the round-trip
+            if not updates.keys() - {"updated_at"}:
+                logger.debug("Skipping no-op update on payment advice %s", payment_advice_uuid)
+                return
+                
+            if now is not None and "updated_at" not in updates:
+                updates["updated_at"] = now
                 
             await self.dao.update_document("payment_advice", payment_advice_uuid, updates)
             logger.info(f"Updated payment advice {payment_advice_uuid} with {len(updates)} fields")
@@ -145,19 +240,21 @@ class PaymentAdviceRepository:
             logger.error(f"Error deleting payment advice {payment_advice_uuid}: {str(e)}")
             raise
             
-    async def update_status(self, payment_advice_uuid: str, status: PaymentAdviceStatus) -> None:
+    async def update_status(self, payment_advice_uuid: str, status: PaymentAdviceStatus,
+                            now: Optional[datetime] = None) -> None:
         """
         Update the status of a payment advice.
         
         Args:
             payment_advice_uuid: UUID of the payment advice
             status: New PaymentAdviceStatus value
+            now: Optional timestamp shared across a batch of writes; when
+                omitted the DAO stamps updated_at with the server timestamp
         """
         try:
-            updates = {
-                "payment_advice_status": status.value,
-                "updated_at": datetime.utcnow()
-            }
+            updates = {"payment_advice_status": status.value}
+            if now is not None:
+                updates["updated_at"] = now
             
             await self.dao.update_document("payment_advice", payment_advice_uuid, updates)
             logger.info(f"Updated payment advice {payment_advice_uuid} status to {status}")
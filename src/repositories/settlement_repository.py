@@ -1,7 +1,8 @@
 """Repository for Settlement entity operations."""
 
 import logging
-from typing import Dict, Any, List, Optional, Union
+import sys
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
 from datetime import datetime
 from uuid import uuid4
 
@@ -10,6 +11,15 @@ from src.repositories.firestore_dao import FirestoreDAO
 
 logger = logging.getLogger(__name__)
 
+def _to_settlements(docs: List[Dict[str, Any]]) -> List[Settlement]:
+    """Build Settlement objects from query results, dropping the DAO's document_id key."""
+    for doc in docs:
+        doc.pop("document_id", None)
+    return [Settlement(**doc) for doc in docs]
+
+# Placeholder for a missing invoice/other doc part of a settlement's composite ID
+_SENTINEL = sys.intern("_")
+
 class SettlementRepository:
     """Repository for Settlement data operations."""
     
@@ -17,33 +27,40 @@ class SettlementRepository:
         """Initialize with a FirestoreDAO instance."""
         self.dao = dao
         
-    async def create(self, settlement: Settlement) -> str:
+    async def create(self, settlement: Settlement, now: Optional[datetime] = None) -> str:
         """
         Create a new settlement record.
         
         Args:
             settlement: Settlement data object
+            now: Optional timestamp shared across a batch of writes; defaults
+                to the current UTC time
             
         Returns:
             settlement_uuid: The UUID of the created settlement
         """
         try:
+            if now is None:
+                now = datetime.utcnow()
+                
             # Generate UUID if not already set
             if not settlement.settlement_uuid:
                 settlement.settlement_uuid = str(uuid4())
                 
             # Set creation timestamp if not set
             if not settlement.created_at:
-                settlement.created_at = datetime.utcnow()
+                settlement.created_at = now
                 
             # Set updated timestamp
-            settlement.updated_at = datetime.utcnow()
+            settlement.updated_at = now
             
             # Create a composite ID to enforce uniqueness
             # {payment_advice_uuid}_{invoice_uuid ?? "_"}_{other_doc_uuid ?? "_"}
-            composite_id = f"{settlement.payment_advice_uuid}_"
-            composite_id += f"{settlement.invoice_uuid if settlement.invoice_uuid else '_'}_"
-            composite_id += f"{settlement.other_doc_uuid if settlement.other_doc_uuid else '_'}"
+            composite_id = "_".join((
+                settlement.payment_advice_uuid,
+                settlement.invoice_uuid or _SENTINEL,
+                settlement.other_doc_uuid or _SENTINEL
+            ))
             
             # Add to Firestore with composite ID
             await self.dao.add_document("settlement", composite_id, settlement)
@@ -93,12 +110,59 @@ class SettlementRepository:
                 "settlement", 
                 filters=[("payment_advice_uuid", "==", payment_advice_uuid)]
             )
-            return [Settlement(**doc) for doc in docs]
+            return _to_settlements(docs)
+            
+        except Exception as e:
+            logger.error(f"Error retrieving settlements for payment advice {payment_advice_uuid}: {str(e)}")
+            raise
+            
+    async def get_page_by_payment_advice(self, payment_advice_uuid: str, page_size: int = 100,
+                                         start_after: Optional[Any] = None) -> Tuple[List[Settlement], Optional[Any]]:
+        """
+        Get one page of the settlements for a specific payment advice.
+        
+        Pass the returned cursor as start_after to fetch the next page.
+        
+        Args:
+            payment_advice_uuid: UUID of the payment advice
+            page_size: Maximum number of objects in the page
+            start_after: Cursor returned with the previous page, or None to
+                start at the first page
+            
+        Returns:
+            Tuple of (Settlement objects in this page, cursor for the next
+            page, or None when this is the last page)
+        """
+        try:
+            docs, next_cursor = await self.dao.query_documents_page(
+                "settlement", 
+                filters=[("payment_advice_uuid", "==", payment_advice_uuid)],
+                page_size=page_size,
+                start_after=start_after
+            )
+            return _to_settlements(docs), next_cursor
             
         except Exception as e:
             logger.error(f"Error retrieving settlements for payment advice {payment_advice_uuid}: {str(e)}")
             raise
             
+    async def iter_by_payment_advice(self, payment_advice_uuid: str) -> AsyncIterator[Settlement]:
+        """
+        Lazily iterate over the settlements of a payment advice.
+        
+        Results are streamed and converted one at a time, so callers that only
+        need the first match do not pay for the rest.
+        
+        Args:
+            payment_advice_uuid: UUID of the payment advice
+            
+        Yields:
+            Settlement objects
+        """
+        async for doc in self.dao.stream_documents("settlement", filters=[("payment_advice_uuid", "==", payment_advice_uuid)]):
+            doc.pop("document_id", None)
+            yield Settlement(**doc)
+            
     async def get_by_invoice(self, invoice_uuid: str) -> List[Settlement]:
         """
         Get all settlements for a specific invoice.
@@ -114,12 +178,59 @@ class SettlementRepository:
                 "settlement", 
                 filters=[("invoice_uuid", "==", invoice_uuid)]
             )
-            return [Settlement(**doc) for doc in docs]
+            return _to_settlements(docs)
+            
+        except Exception as e:
+            logger.error(f"Error retrieving settlements for invoice {invoice_uuid}: {str(e)}")
+            raise
+            
+    async def get_page_by_invoice(self, invoice_uuid: str, page_size: int = 100,
+                                  start_after: Optional[Any] = None) -> Tuple[List[Settlement], Optional[Any]]:
+        """
+        Get one page of the settlements for a specific invoice.
+        
+        Pass the returned cursor as start_after to fetch the next page.
+        
+        Args:
+            invoice_uuid: UUID of the invoice
+            page_size: Maximum number of objects in the page
+            start_after: Cursor returned with the previous page, or None to
+                start at the first page
+            
+        Returns:
+            Tuple of (Settlement objects in this page, cursor for the next
+            page, or None when this is the last page)
+        """
+        try:
+            docs, next_cursor = await self.dao.query_documents_page(
+                "settlement", 
+                filters=[("invoice_uuid", "==", invoice_uuid)],
+                page_size=page_size,
+                start_after=start_after
+            )
+            return _to_settlements(docs), next_cursor
             
         except Exception as e:
             logger.error(f"Error retrieving settlements for invoice {invoice_uuid}: {str(e)}")
             raise
             
+    async def iter_by_invoice(self, invoice_uuid: str) -> AsyncIterator[Settlement]:
+        """
+        Lazily iterate over the settlements of an invoice.
+        
+        Results are streamed and converted one at a time, so callers that only
+        need the first match do not pay for the rest.
+        
+        Args:
+            invoice_uuid: UUID of the invoice
+            
+        Yields:
+            Settlement objects
+        """
+        async for doc in self.dao.stream_documents("settlement", filters=[("invoice_uuid", "==", invoice_uuid)]):
+            doc.pop("document_id", None)
+            yield Settlement(**doc)
+            
     async def get_by_other_doc(self, other_doc_uuid: str) -> List[Settlement]:
         """
         Get all settlements for a specific other doc.
@@ -135,24 +246,78 @@ class SettlementRepository:
                 "settlement", 
                 filters=[("other_doc_uuid", "==", other_doc_uuid)]
             )
-            return [Settlement(**doc) for doc in docs]
+            return _to_settlements(docs)
+            
+        except Exception as e:
+            logger.error(f"Error retrieving settlements for other doc {other_doc_uuid}: {str(e)}")
+            raise
+            
+    async def get_page_by_other_doc(self, other_doc_uuid: str, page_size: int = 100,
+                                    start_after: Optional[Any] = None) -> Tuple[List[Settlement], Optional[Any]]:
+        """
+        Get one page of the settlements for a specific other doc.
+        
+        Pass the returned cursor as start_after to fetch the next page.
+        
+        Args:
+            other_doc_uuid: UUID of the other doc
+            page_size: Maximum number of objects in the page
+            start_after: Cursor returned with the previous page, or None to
+                start at the first page
+            
+        Returns:
+            Tuple of (Settlement objects in this page, cursor for the next
+            page, or None when this is the last page)
+        """
+        try:
+            docs, next_cursor = await self.dao.query_documents_page(
+                "settlement", 
+                filters=[("other_doc_uuid", "==", other_doc_uuid)],
+                page_size=page_size,
+                start_after=start_after
+            )
+            return _to_settlements(docs), next_cursor
             
         except Exception as e:
             logger.error(f"Error retrieving settlements for other doc {other_doc_uuid}: {str(e)}")
             raise
             
-    async def update(self, settlement_uuid: str, updates: Dict[str, Any]) -> None:
+    async def iter_by_other_doc(self, other_doc_uuid: str) -> AsyncIterator[Settlement]:
+        """
+        Lazily iterate over the settlements of an other doc.
+        
+        Results are streamed and converted one at a time, so callers that only
+        need the first match do not pay for the rest.
+        
+        Args:
+            other_doc_uuid: UUID of the other doc
+            
+        Yields:
+            Settlement objects
+        """
+        async for doc in self.dao.stream_documents("settlement", filters=[("other_doc_uuid", "==", other_doc_uuid)]):
+            doc.pop("document_id", None)
+            yield Settlement(**doc)
+            
+    async def update(self, settlement_uuid: str, updates: Dict[str, Any],
+                     now: Optional[datetime] = None) -> None:
         """
         Update a settlement with new data.
         
         Args:
             settlement_uuid: UUID of the settlement
             updates: Dictionary of fields to update
+            now: Optional timestamp shared across a batch of writes; when
+                omitted the DAO stamps updated_at with the server timestamp
         """
         try:
-            # Always update the updated_at timestamp
-            if "updated_at" not in updates:
-                updates["updated_at"] = datetime.utcnow()
+            # Nothing to write besides the timestamp; skip the round-trip
+            if not updates.keys() - {"updated_at"}:
+                logger.debug("Skipping no-op update on settlement %s", settlement_uuid)
+                return
+                
+            if now is not None and "updated_at" not in updates:
+                updates["updated_at"] = now
                 
             await self.dao.update_document("settlement", settlement_uuid, updates)
             logger.info(f"Updated settlement {settlement_uuid} with {len(updates)} fields")
@@ -176,19 +341,21 @@ class SettlementRepository:
             logger.error(f"Error deleting settlement {settlement_uuid}: {str(e)}")
             raise
             
-    async def update_status(self, settlement_uuid: str, status: SettlementStatus) -> None:
+    async def update_status(self, settlement_uuid: str, status: SettlementStatus,
+                            now: Optional[datetime] = None) -> None:
         """
         Update the status of a settlement.
         
         Args:
             settlement_uuid: UUID of the settlement
             status: New SettlementStatus value
+            now: Optional timestamp shared across a batch of writes; when
+                omitted the DAO stamps updated_at with the server timestamp
         """
         try:
-            updates = {
-                "settlement_status": status.value,
-                "updated_at": datetime.utcnow()
-            }
+            updates = {"settlement_status": status.value}
+            if now is not None:
+                updates["updated_at"] = now
             
             await self.dao.update_document("settlement", settlement_uuid, updates)
             logger.info(f"Updated settlement {settlement_uuid} status to {status}")
@@ -1,8 +1,9 @@
 """Service for enriching payment advice lines with account information."""
 
+import asyncio
 import logging
+import time
 from typing import Dict, List, Optional, Any, Tuple
-from collections import defaultdict
 
 from src.models.account import Account
 from src.repositories.account_repository import AccountRepository
@@ -11,20 +12,122 @@ from src.config import TDS_ACCOUNT_CODE
 
 logger = logging.getLogger(__name__)
 
+# Account lookups are cached in-process; accounts change rarely and the same
+# legal entities recur across the advices of a batch run
+ACCOUNT_CACHE_TTL_SECONDS = 300
+ACCOUNT_CACHE_MAXSIZE = 2048
+
+# Fields read by the enrichment pass; queries project to these to cut payload size
+PAYMENT_ADVICE_LINE_FIELDS = ["payment_advice_line_uuid", "account_type", "doc_type", "updated_at", "bp_code", "gl_code"]
+
+# Marks a BP account that has not been looked up yet (None means "not found")
+_NOT_FETCHED = object()
+
 class AccountEnrichmentService:
     """Service for enriching payment advice lines with account information."""
     
-    def __init__(self, dao: FirestoreDAO):
-        """Initialize with Firestore DAO."""
+    def __init__(self, dao: FirestoreDAO, atomic_line_updates: bool = True):
+        """
+        Initialize with Firestore DAO.
+        
+        Args:
+            dao: Firestore DAO instance
+            atomic_line_updates: Commit line updates in WriteBatches; when False,
+                lines are updated individually with bounded concurrency
+        """
         self.dao = dao
+        self.atomic_line_updates = atomic_line_updates
         self.account_repo = AccountRepository(dao)
+        # (kind, key) -> (fetched_at, account); only found accounts are cached
+        self._account_cache: Dict[Tuple[str, ...], Tuple[float, Account]] = {}
+        # Locks for lookups in progress; removed once the lookup completes
+        self._account_locks: Dict[Tuple[str, ...], asyncio.Lock] = {}
+    
+    async def _get_cached_account(self, key: Tuple[str, ...], fetch) -> Optional[Account]:
+        """
+        Return a cached account lookup, fetching it on a miss or after expiry.
+        
+        Concurrent misses for the same key wait on one lock so only one of them
+        queries Firestore. Lookups that find nothing are not cached: the
+        repository also returns None when Firestore fails, and a transient
+        error must not read as "no account" until the entry expires.
+        
+        Args:
+            key: Cache key identifying the lookup
+            fetch: Zero-argument coroutine function performing the lookup
+            
+        Returns:
+            The account, or None if the lookup found nothing
+        """
+        entry = self._account_cache.get(key)
+        if entry and time.monotonic() - entry[0] < ACCOUNT_CACHE_TTL_SECONDS:
+            return entry[1]
+            
+        lock = self._account_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                # Another waiter may have filled the entry while we were blocked
+                entry = self._account_cache.get(key)
+                if entry and time.monotonic() - entry[0] < ACCOUNT_CACHE_TTL_SECONDS:
+                    return entry[1]
+                    
+                account = await fetch()
+                if account is not None:
+                    if key not in self._account_cache and len(self._account_cache) >= ACCOUNT_CACHE_MAXSIZE:
+                        # Evict the oldest insertion
+                        del self._account_cache[next(iter(self._account_cache))]
+                    self._account_cache[key] = (time.monotonic(), account)
+                return account
+        finally:
+            # Waiters still hold the lock object; later misses start a new one
+            if self._account_locks.get(key) is lock:
+                del self._account_locks[key]
+    
+    async def get_bp_account(self, legal_entity_uuid: str) -> Optional[Account]:
+        """Get the BP account for a legal entity, using the in-process cache."""
+        return await self._get_cached_account(
+            ("bp", legal_entity_uuid),
+            lambda: self.account_repo.get_bp_account_by_legal_entity(legal_entity_uuid)
+        )
+    
+    async def prefetch_bp_accounts(self, legal_entity_uuids: List[str]) -> None:
+        """
+        Warm the BP account cache for many legal entities with bulk queries.
+        
+        Batch callers that know the legal entities of all their payment advices
+        up front can call this once, so the per-advice enrichment hits the cache.
+        
+        Args:
+            legal_entity_uuids: UUIDs of the legal entities to prefetch
+        """
+        missing = [
+            uuid for uuid in dict.fromkeys(legal_entity_uuids)
+            if uuid and ("bp", uuid) not in self._account_cache
+        ]
+        if not missing:
+            return
+            
+        accounts = await self.account_repo.get_bp_accounts_by_legal_entities(missing)
+        fetched_at = time.monotonic()
+        # Only cache hits; a legal entity missing here may be due to a failed
+        # chunk, so let the per-advice lookup query it again
+        for uuid, account in accounts.items():
+            if len(self._account_cache) >= ACCOUNT_CACHE_MAXSIZE:
+                break
+            self._account_cache[("bp", uuid)] = (fetched_at, account)
     
-    async def get_payment_advice_lines(self, payment_advice_uuid: str) -> List[Dict[str, Any]]:
+    async def get_tds_account(self) -> Optional[Account]:
+        """Get the TDS account, using the in-process cache."""
+        return await self._get_cached_account(("tds",), self.account_repo.get_tds_account)
+    
+    async def get_payment_advice_lines(self, payment_advice_uuid: str,
+                                       select: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Get all payment advice lines for a payment advice.
         
         Args:
             payment_advice_uuid: UUID of the payment advice
+            select: Optional field paths to project; defaults to full documents
             
         Returns:
             List of payment advice line objects
@@ -33,7 +136,8 @@ class AccountEnrichmentService:
             # Query payment advice lines with the given payment advice UUID
             lines = await self.dao.query_documents(
                 "paymentadvice_lines", 
-                [("payment_advice_uuid", "==", payment_advice_uuid)]
+                [("payment_advice_uuid", "==", payment_advice_uuid)],
+                select=select
             )
             
             logger.info(f"Found {len(lines)} payment advice lines for {payment_advice_uuid}")
@@ -42,19 +146,21 @@ class AccountEnrichmentService:
             logger.error(f"Error getting payment advice lines for {payment_advice_uuid}: {str(e)}")
             return []
 
-    async def get_payment_advice(self, payment_advice_uuid: str) -> Optional[Dict[str, Any]]:
+    async def get_payment_advice(self, payment_advice_uuid: str,
+                                 select: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
         """
         Get a payment advice by UUID.
         
         Args:
             payment_advice_uuid: UUID of the payment advice
+            select: Optional field paths to project; defaults to the full document
             
         Returns:
             Payment advice object if found, None otherwise
         """
         try:
             # Get payment advice
-            payment_advice = await self.dao.get_document("payment_advice", payment_advice_uuid)
+            payment_advice = await self.dao.get_document("payment_advice", payment_advice_uuid, select=select)
             if not payment_advice:
                 logger.error(f"Payment advice {payment_advice_uuid} not found")
                 return None
@@ -64,7 +170,7 @@ class AccountEnrichmentService:
             logger.error(f"Error getting payment advice {payment_advice_uuid}: {str(e)}")
             return None
     
-    async def categorize_lines(self, lines: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    def categorize_lines(self, lines: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
         Categorize payment advice lines into BP and GL types.
         
@@ -74,75 +180,46 @@ class AccountEnrichmentService:
         Returns:
             Tuple of (bp_lines, gl_lines)
         """
-        bp_lines = []
-        gl_lines = []
+        bp_lines, gl_lines = [], []
         
         for line in lines:
-            account_type = line.get("account_type", "").upper()
-            doc_type = line.get("doc_type", "").upper()
-            
-            # TDS entries are always GL type
-            if doc_type == "TDS":
-                line["account_type"] = "GL"
-                gl_lines.append(line)
-            elif account_type == "GL":
-                gl_lines.append(line)
-            else:
-                # Default to BP type if not specified or not GL
-                line["account_type"] = "BP"
-                bp_lines.append(line)
+            # TDS entries are always GL type; anything not GL defaults to BP
+            is_gl = (line.get("doc_type") or "").upper() == "TDS" or (line.get("account_type") or "").upper() == "GL"
+            line["account_type"] = "GL" if is_gl else "BP"
+            (gl_lines if is_gl else bp_lines).append(line)
                 
         logger.info(f"Categorized lines: {len(bp_lines)} BP lines, {len(gl_lines)} GL lines")
         return bp_lines, gl_lines
     
-    async def enrich_bp_lines(self, bp_lines: List[Dict[str, Any]], legal_entity_uuid: str) -> List[Dict[str, Any]]:
+    async def enrich_bp_lines(self, bp_lines: List[Dict[str, Any]], legal_entity_uuid: str,
+                              bp_account: Any = _NOT_FETCHED) -> Tuple[List[Dict[str, Any]], bool]:
         """
         Enrich BP lines with BP code from account linked to legal entity.
         
         Args:
             bp_lines: List of payment advice lines with account_type = BP
             legal_entity_uuid: UUID of the legal entity
+            bp_account: BP account already fetched by the caller (may be None if
+                it was not found); looked up here when omitted
             
         Returns:
-            List of enriched BP lines
+            Tuple of (BP lines, whether a BP code was applied to them)
         """
         if not bp_lines:
             logger.warning("No BP lines to enrich")
-            return []
+            return [], False
         
         logger.info(f"Starting BP line enrichment for legal entity {legal_entity_uuid}, found {len(bp_lines)} BP lines")
             
-        # Check if legal entity exists
-        legal_entity = await self.dao.get_document("legal_entity", legal_entity_uuid)
-        if not legal_entity:
-            logger.error(f"Legal entity not found with UUID: {legal_entity_uuid}")
-        else:
-            logger.info(f"Legal entity exists: {legal_entity.get('name')}")
-        
-        # Get the BP account for the legal entity (one query for all BP lines)
-        logger.info(f"Looking up BP account for legal entity {legal_entity_uuid}")
-        
-        # First check for accounts directly
-        accounts = await self.dao.query_documents(
-            "account", 
-            [
-                ("legal_entity_uuid", "==", legal_entity_uuid),
-                ("account_type", "==", "BP")
-            ]
-        )
-        if accounts:
-            logger.info(f"Direct query found {len(accounts)} BP accounts for legal entity {legal_entity_uuid}")
-            for acct in accounts:
-                logger.info(f"Account: {acct.get('account_uuid')}, SAP ID: {acct.get('sap_account_id')}")
-        else:
-            logger.warning(f"No accounts found directly for legal entity {legal_entity_uuid}")
-        
-        # Now try through the repository
-        bp_account = await self.account_repo.get_bp_account_by_legal_entity(legal_entity_uuid)
+        # Get the BP account for the legal entity (one query for all BP lines),
+        # unless the caller already fetched it
+        if bp_account is _NOT_FETCHED:
+            logger.info(f"Looking up BP account for legal entity {legal_entity_uuid}")
+            bp_account = await self.get_bp_account(legal_entity_uuid)
         
         if not bp_account or not bp_account.sap_account_id:
             logger.warning(f"No BP account or SAP ID found for legal entity {legal_entity_uuid} via repository")
-            return bp_lines
+            return bp_lines, False
             
         bp_code = bp_account.sap_account_id
         logger.info(f"Found BP code {bp_code} for legal entity {legal_entity_uuid}")
@@ -151,11 +228,11 @@ class AccountEnrichmentService:
         enriched_lines = []
         for line in bp_lines:
             line["bp_code"] = bp_code
-            logger.info(f"Enriched line {line.get('payment_advice_line_uuid')} with BP code {bp_code}")
+            logger.debug("Enriched line %s with BP code %s", line.get("payment_advice_line_uuid"), bp_code)
             enriched_lines.append(line)
             
         logger.info(f"Successfully enriched {len(enriched_lines)} BP lines with BP code {bp_code}")
-        return enriched_lines
+        return enriched_lines, True
     
     async def enrich_gl_lines(self, gl_lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -170,35 +247,36 @@ class AccountEnrichmentService:
         if not gl_lines:
             return []
             
-        # Group GL lines by doc_type
-        doc_type_lines = defaultdict(list)
+        # Single pass: only TDS lines are touched, so tag them inline and look
+        # up the TDS GL code on the first one (one query for all TDS lines)
+        tds_gl_code = None
         for line in gl_lines:
-            doc_type = line.get("doc_type", "").upper()
-            doc_type_lines[doc_type].append(line)
-            
-        # Process TDS lines specifically
-        tds_lines = doc_type_lines.get("TDS", [])
-        if tds_lines:
-            # Get TDS account (one query for all TDS lines)
-            tds_account = await self.account_repo.get_tds_account()
-            
-            # Get TDS GL code - either from account or from config
-            tds_gl_code = None
-            if tds_account and tds_account.sap_account_id:
-                tds_gl_code = tds_account.sap_account_id
-                logger.info(f"Found TDS GL code {tds_gl_code} from TDS account")
-            else:
-                # Fallback to config if TDS account not found in database
-                tds_gl_code = TDS_ACCOUNT_CODE
-                logger.info(f"Using default TDS GL code {tds_gl_code} from config")
-            
-            # Enrich all TDS lines with the same GL code
-            for line in tds_lines:
-                line["gl_code"] = tds_gl_code
+            if (line.get("doc_type") or "").upper() != "TDS":
+                continue
+                
+            if tds_gl_code is None:
+                tds_gl_code = await self._get_tds_gl_code()
+            line["gl_code"] = tds_gl_code
             
         # Return all GL lines (TDS and non-TDS)
         return gl_lines
             
+    async def _get_tds_gl_code(self) -> str:
+        """
+        Get the TDS GL code, either from the TDS account or from config.
+        
+        Returns:
+            SAP account ID of the TDS account, or TDS_ACCOUNT_CODE as fallback
+        """
+        tds_account = await self.get_tds_account()
+        if tds_account and tds_account.sap_account_id:
+            logger.info(f"Found TDS GL code {tds_account.sap_account_id} from TDS account")
+            return tds_account.sap_account_id
+            
+        # Fallback to config if TDS account not found in database
+        logger.info(f"Using default TDS GL code {TDS_ACCOUNT_CODE} from config")
+        return TDS_ACCOUNT_CODE
+    
     async def enrich_payment_advice_lines(self, payment_advice_uuid: str) -> bool:
         """
         Enrich payment advice lines with account information.
@@ -211,7 +289,7 @@ class AccountEnrichmentService:
         """
         try:
             # Get payment advice
-            payment_advice = await self.get_payment_advice(payment_advice_uuid)
+            payment_advice = await self.get_payment_advice(payment_advice_uuid, select=["legal_entity_uuid"])
             if not payment_advice:
                 return False
                 
@@ -221,17 +299,20 @@ class AccountEnrichmentService:
                 logger.warning(f"Payment advice {payment_advice_uuid} has no legal entity UUID")
                 return False
                 
-            # Get payment advice lines
-            lines = await self.get_payment_advice_lines(payment_advice_uuid)
+            # Fetch the lines and the BP account concurrently; they are independent
+            lines, bp_account = await asyncio.gather(
+                self.get_payment_advice_lines(payment_advice_uuid, select=PAYMENT_ADVICE_LINE_FIELDS),
+                self.get_bp_account(legal_entity_uuid)
+            )
             if not lines:
                 logger.warning(f"No payment advice lines found for {payment_advice_uuid}")
                 return False
                 
             # Categorize lines into BP and GL types
-            bp_lines, gl_lines = await self.categorize_lines(lines)
+            bp_lines, gl_lines = self.categorize_lines(lines)
             
             # Enrich BP lines with BP code
-            enriched_bp_lines = await self.enrich_bp_lines(bp_lines, legal_entity_uuid)
+            enriched_bp_lines, bp_enriched = await self.enrich_bp_lines(bp_lines, legal_entity_uuid, bp_account)
             
             # Enrich GL lines with GL code
             enriched_gl_lines = await self.enrich_gl_lines(gl_lines)
@@ -239,43 +320,51 @@ class AccountEnrichmentService:
             # Combine all enriched lines
             all_enriched_lines = enriched_bp_lines + enriched_gl_lines
             
-            # Update each line in Firestore
-            update_count = 0
+            # The written fields are the same for every line of a kind, so build
+            # one update template per kind and share it across lines (the DAO
+            # copies each payload and stamps updated_at)
+            if bp_enriched:
+                bp_template = {"account_type": "BP", "sap_enrichment_status": "enriched",
+                               "bp_code": bp_account.sap_account_id}
+            else:
+                # No BP account: only record the status, there is no code to write
+                bp_template = {"account_type": "BP", "sap_enrichment_status": "missing_bp_account"}
+            gl_template = {"account_type": "GL", "sap_enrichment_status": "enriched"}
+            gl_code_templates = {}
+            
+            # Collect the per-line updates, then commit them in batched writes
+            pending_updates = {}
             for line in all_enriched_lines:
-                try:
-                    line_uuid = line.get("payment_advice_line_uuid")
-                    if not line_uuid:
-                        logger.warning(f"Line has no UUID: {line}")
-                        continue
-                        
-                    # Update specific fields only
-                    updates = {
-                        "account_type": line.get("account_type"),
-                        "updated_at": line.get("updated_at"),
-                        "sap_enrichment_status": "enriched"
-                    }
+                line_uuid = line.get("payment_advice_line_uuid")
+                if not line_uuid:
+                    logger.warning(f"Line has no UUID: {line}")
+                    continue
+                    
+                if line["account_type"] == "BP":
+                    pending_updates[line_uuid] = bp_template
+                    continue
                     
-                    # Add BP code if present
-                    if "bp_code" in line:
-                        updates["bp_code"] = line["bp_code"]
-                        logger.info(f"Adding BP code {line['bp_code']} to line {line_uuid}")
-                    else:
-                        logger.warning(f"No BP code found in line {line_uuid} (account type: {line.get('account_type')})")
-                        
-                    # Add GL code if present
-                    if "gl_code" in line:
-                        updates["gl_code"] = line["gl_code"]
-                        
-                    # Update line in Firestore
-                    logger.info(f"Updating line {line_uuid} in Firestore with: {updates}")
-                    await self.dao.update_document("paymentadvice_lines", line_uuid, updates)
-                    logger.info(f"Successfully updated line {line_uuid} in Firestore")
-                    update_count += 1
+                gl_code = line.get("gl_code")
+                if gl_code is None:
+                    pending_updates[line_uuid] = gl_template
+                    continue
                     
-                except Exception as e:
-                    logger.error(f"Error updating line: {str(e)}")
+                template = gl_code_templates.get(gl_code)
+                if template is None:
+                    template = gl_code_templates[gl_code] = {**gl_template, "gl_code": gl_code}
+                pending_updates[line_uuid] = template
+            
+            update_count = 0
+            if pending_updates:
+                if self.atomic_line_updates:
+                    update_count = await self.dao.batch_update_documents("paymentadvice_lines", pending_updates)
+                else:
+                    update_count = await self.dao.update_documents_concurrently("paymentadvice_lines", pending_updates)
                     
-            logger.info(f"Successfully updated {update_count} out of {len(all_enriched_lines)} payment advice lines")
+            logger.info(
+                "Enriched %d BP lines, %d GL lines, updated %d out of %d payment advice lines",
+                len(enriched_bp_lines), len(enriched_gl_lines), update_count, len(all_enriched_lines)
+            )
             return update_count > 0
             
         except Exception as e:
@@ -1,25 +1,34 @@
 """Email processing service for payment advice extraction."""
 
+import asyncio
+import hashlib
 import logging
 import re
 import pandas as pd
 import io
-import tempfile
 import uuid
 import os
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
-import tempfile
 import openpyxl
-import fitz
-from src.services.payment_advice_processor.group_factory import GroupProcessorFactory
+from src.services.payment_advice_processor.group_factory import DefaultGroupProcessor, GroupProcessorFactory
 from src.models.schemas import EmailLog, EmailProcessingLog, ProcessingStatus
 from src.services.legal_entity_lookup import LegalEntityLookupService
 from src.repositories.firestore_dao import FirestoreDAO
+from src.repositories.llm_response_cache_repository import LLMResponseCacheRepository
 from src.external_apis.gcp.gcs_uploader import GCSUploader
+from src.services.email.pdf_text_extractor import extract_pdf_pages_text
+from src.config import LLM_MAX_CONCURRENCY, LLM_RESPONSE_CACHE_TTL_DAYS, MAX_PDF_PAGES, PDF_TEXT_MAX_CHARS
 
 logger = logging.getLogger(__name__)
 
+# Attachment preprocessing is blocking parse work, so it runs off the event loop
+_preprocess_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="attachment-preprocess")
+
+# Maximum number of legal entity detection results kept per EmailProcessor
+LEGAL_ENTITY_CACHE_MAXSIZE = 1024
+
 
 class EmailProcessor:
     """
@@ -43,6 +52,63 @@ class EmailProcessor:
         # Initialize the legal entity lookup service
         self.legal_entity_lookup = LegalEntityLookupService(dao)
         
+        # Extraction responses reused when the same document is processed again
+        self.llm_response_cache = LLMResponseCacheRepository(dao) if LLM_RESPONSE_CACHE_TTL_DAYS > 0 else None
+        
+        # Detection results keyed by a hash of (email body, document text); the
+        # processor lives for a whole batch run, so repeats across emails hit too
+        self._legal_entity_cache: Dict[str, Dict[str, Any]] = {}
+        # Detections currently running, so concurrent identical requests share one call
+        self._legal_entity_inflight: Dict[str, asyncio.Task] = {}
+        
+    async def _detect_legal_entity_cached(self, email_body: Optional[str], document_text: Optional[str]) -> Dict[str, Any]:
+        """
+        Detect the legal entity for a body/document pair, reusing earlier results.
+        
+        Only successful detections are cached, so a miss is retried next time.
+        Concurrent calls for the same pair (e.g. identical attachments of one
+        email) wait on a single detection instead of each calling the LLM.
+        
+        Args:
+            email_body: Email body text
+            document_text: Document text (from attachment)
+            
+        Returns:
+            Dictionary with legal_entity_uuid and group_uuid
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update((email_body or "").encode())
+        digest.update(b"\0")
+        digest.update((document_text or "").encode())
+        key = digest.hexdigest()
+        
+        cached = self._legal_entity_cache.get(key)
+        if cached is not None:
+            logger.info(f"Using cached legal entity detection result: {cached}")
+            return dict(cached)
+            
+        inflight = self._legal_entity_inflight.get(key)
+        if inflight is not None:
+            logger.info("Waiting for an identical legal entity detection already in flight")
+            return dict(await asyncio.shield(inflight))
+            
+        task = asyncio.ensure_future(self.legal_entity_lookup.detect_legal_entity(
+            email_body=email_body,
+            document_text=document_text
+        ))
+        self._legal_entity_inflight[key] = task
+        try:
+            result = await task
+        finally:
+            self._legal_entity_inflight.pop(key, None)
+        
+        if result.get('legal_entity_uuid'):
+            if len(self._legal_entity_cache) >= LEGAL_ENTITY_CACHE_MAXSIZE:
+                # Evict the oldest insertion
+                del self._legal_entity_cache[next(iter(self._legal_entity_cache))]
+            self._legal_entity_cache[key] = dict(result)
+        return result
+        
     def _log_llm_output_summary(self, one_or_more_structured_payment_advices, source_name):
         """
         Log detailed summary of extracted LLM data.
@@ -51,181 +117,126 @@ class EmailProcessor:
             one_or_more_structured_payment_advices: The LLM extraction output dictionary
             source_name: Name of the source ("email body" or attachment filename)
         """
+        # Skip all the formatting when INFO records would be dropped anyway
+        if not logger.isEnabledFor(logging.INFO):
+            return
+            
         for each in one_or_more_structured_payment_advices:
-            logger.info(f"LLM extracted data for {source_name}:")
-        
+            # One record per advice instead of one per field
+            lines = [f"LLM extracted data for {source_name}:"]
+            
             # Meta Table detailed logging
             meta_table = each.get('metaTable', {})
-            logger.info(f"  Meta Table:")
-            logger.info(f"    paymentAdviceNumber: {meta_table.get('paymentAdviceNumber')}")
-            logger.info(f"    paymentAdviceDate: {meta_table.get('paymentAdviceDate')}")
-            logger.info(f"    paymentAdviceAmount: {meta_table.get('paymentAdviceAmount')}")
-            logger.info(f"    payersLegalName: {meta_table.get('payersLegalName')}")
-            logger.info(f"    payeesLegalName: {meta_table.get('payeesLegalName')}")
+            lines.append("  Meta Table:")
+            for key in ('paymentAdviceNumber', 'paymentAdviceDate', 'paymentAdviceAmount',
+                        'payersLegalName', 'payeesLegalName'):
+                lines.append(f"    {key}: {meta_table.get(key)}")
             
             # Invoice Table summary
             invoice_table = each.get('invoiceTable', [])
-            logger.info(f"  Invoice Table: {len(invoice_table)} items")
+            lines.append(f"  Invoice Table: {len(invoice_table)} items")
             for i, invoice in enumerate(invoice_table[:3]):  # Log first 3 invoices
-                logger.info(f"    Invoice {i+1}: {invoice.get('invoiceNumber')} - Amount: {invoice.get('totalSettlementAmount')}")
+                lines.append(f"    Invoice {i+1}: {invoice.get('invoiceNumber')} - Amount: {invoice.get('totalSettlementAmount')}")
             if len(invoice_table) > 3:
-                logger.info(f"    ... and {len(invoice_table) - 3} more invoices")
+                lines.append(f"    ... and {len(invoice_table) - 3} more invoices")
             
             # Other Doc Table summary
             other_doc_table = each.get('otherDocTable', [])
-            logger.info(f"  Other Doc Table: {len(other_doc_table)} items")
+            lines.append(f"  Other Doc Table: {len(other_doc_table)} items")
             for i, doc in enumerate(other_doc_table[:3]):  # Log first 3 other docs
-                logger.info(f"    Other Doc {i+1}: {doc.get('otherDocNumber')} ({doc.get('otherDocType')}) - Amount: {doc.get('otherDocAmount')}")
+                lines.append(f"    Other Doc {i+1}: {doc.get('otherDocNumber')} ({doc.get('otherDocType')}) - Amount: {doc.get('otherDocAmount')}")
             if len(other_doc_table) > 3:
-                logger.info(f"    ... and {len(other_doc_table) - 3} more other docs")
+                lines.append(f"    ... and {len(other_doc_table) - 3} more other docs")
             
             # Settlement Table summary
             settlement_table = each.get('settlementTable', [])
-            logger.info(f"  Settlement Table: {len(settlement_table)} items")
+            lines.append(f"  Settlement Table: {len(settlement_table)} items")
             for i, settlement in enumerate(settlement_table[:3]):  # Log first 3 settlements
-                logger.info(f"    Settlement {i+1}: {settlement.get('invoiceNumber')} -> {settlement.get('settlementDocNumber')} - Amount: {settlement.get('settlementAmount')}")
+                lines.append(f"    Settlement {i+1}: {settlement.get('invoiceNumber')} -> {settlement.get('settlementDocNumber')} - Amount: {settlement.get('settlementAmount')}")
             if len(settlement_table) > 3:
-                logger.info(f"    ... and {len(settlement_table) - 3} more settlements")
+                lines.append(f"    ... and {len(settlement_table) - 3} more settlements")
+                
+            logger.info("\n".join(lines))
     
-    async def _preprocess_attachment(self, attachment, attachment_idx=0, total_attachments=1):
+    def _extract_pdf_text(self, attachment, attachment_filename):
         """
-        Preprocess an attachment to extract its text content based on file type.
-        This function can be extended to support more file types in the future.
+        Extract the text of a PDF attachment into attachment['text_content'].
         
         Args:
             attachment: The attachment dictionary
-            attachment_idx: Index of the attachment for logging purposes
-            total_attachments: Total number of attachments for logging purposes
-            
-        Returns:
-            The attachment with text_content field added if applicable
+            attachment_filename: Attachment filename for logging purposes
         """
-        attachment_filename = attachment.get('filename', f'attachment-{attachment_idx}')
-        logger.info(f"Processing attachment {attachment_idx+1}/{total_attachments}: {attachment_filename}")
-        
-        # Log detailed attachment info before processing
-        logger.info(f"  Filename: {attachment_filename}")
-        content_type = attachment.get('content_type', 'unknown')
-        logger.info(f"  Content type: {content_type}")
-        logger.info(f"  Size: {len(attachment.get('content', b''))} bytes")
-        
-        # If text content is already extracted, return as is
-        if 'text_content' in attachment:
-            logger.info(f"Attachment already has text content of {len(attachment['text_content'])} characters")
-            return attachment
+        try:
+            logger.info(f"Extracting text from PDF attachment using PyMuPDF: {attachment_filename}")
+            
+            pdf_bytes = attachment.get('content', b'')
             
-        # Extract text content from PDF if needed
-        if 'pdf' in content_type.lower():
+            # Extract text from PDF using PyMuPDF (fitz), straight from memory
             try:
-                logger.info(f"Extracting text from PDF attachment using PyMuPDF: {attachment_filename}")
+                pdf_text = "\n\n".join(extract_pdf_pages_text(
+                    pdf_bytes, max_chars=PDF_TEXT_MAX_CHARS, max_pages=MAX_PDF_PAGES
+                ))
                 
-                # Create a temporary file to save the PDF
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                    temp_file.write(attachment.get('content', b''))
-                    temp_pdf_path = temp_file.name
+                logger.info(f"Extracted {len(pdf_text)} characters from PDF attachment")
+                # Add extracted text to attachment data
+                attachment['text_content'] = pdf_text
+                attachment['extraction_method'] = 'PyMuPDF'
                 
-                # Extract text from PDF using PyMuPDF (fitz)
-                pdf_text = ""
-                raw_text = ""
+                # Log sample of extracted text for debugging
+                text_preview = pdf_text[:500] + '...' if len(pdf_text) > 500 else pdf_text
+                logger.info(f"PDF Text Preview:\n{text_preview}")
+                
+            except Exception as pdf_err:
+                # PyMuPDF opens essentially every PDF the other parsers can, so
+                # there is no secondary parser; the attachment gets empty text
+                logger.error(f"Error extracting text from PDF using PyMuPDF: {str(pdf_err)}")
+        except ImportError:
+            logger.warning("PyMuPDF not installed. PDF text extraction will be skipped.")
+            logger.warning("Failed to extract text from PDF attachment due to missing dependencies")
+                
+    def _extract_excel_text(self, attachment, attachment_filename):
+        """
+        Extract the text of an Excel attachment into attachment['text_content'].
+        
+        Args:
+            attachment: The attachment dictionary
+            attachment_filename: Attachment filename for logging purposes
+        """
+        try:                
+            logger.info(f"Extracting text from Excel file: {attachment_filename}")
+            
+            # Get the content as bytes
+            content = attachment.get('content')
+            if content:
                 try:
-                    # Open the PDF with PyMuPDF
-                    pdf_document = fitz.open(temp_pdf_path)
+                    # First try to read directly from bytes using pandas
+                    excel_data = pd.read_excel(io.BytesIO(content))
                     
-                    # Process each page
-                    for page_num in range(len(pdf_document)):
-                        page = pdf_document.load_page(page_num)
-                        
-                        # Extract text with better layout preservation
-                        page_text = page.get_text("text")
-                        pdf_text += page_text + "\n\n"
-                        
-                        # Also store raw text version for debugging
-                        raw_text += page.get_text("rawdict") + "\n\n"
+                    # Convert DataFrame to string representation
+                    text_content = ""
                     
-                    # Close the document
-                    pdf_document.close()
+                    # Add column headers
+                    headers = ", ".join(str(col) for col in excel_data.columns)
+                    text_content += f"Headers: {headers}\n\n"
                     
-                    logger.info(f"Extracted {len(pdf_text)} characters from PDF attachment")
-                    # Add extracted text to attachment data
-                    attachment['text_content'] = pdf_text
-                    attachment['raw_text_content'] = raw_text
-                    attachment['extraction_method'] = 'PyMuPDF'
+                    # Add rows as text
+                    for idx, row in excel_data.iterrows():
+                        row_text = f"Row {idx+1}: " + ", ".join(f"{col}: {val}" for col, val in row.items() if pd.notna(val))
+                        text_content += row_text + "\n"
                     
-                    # Log sample of extracted text for debugging
-                    text_preview = pdf_text[:500] + '...' if len(pdf_text) > 500 else pdf_text
-                    logger.info(f"PDF Text Preview:\n{text_preview}")
+                    logger.info(f"Successfully extracted {len(text_content)} characters from Excel file")
+                    attachment['text_content'] = text_content
+                    attachment['extraction_method'] = 'pandas'
                     
-                except Exception as pdf_err:
-                    logger.error(f"Error extracting text from PDF using PyMuPDF: {str(pdf_err)}")
-                    # Fallback to simple text extraction if PyMuPDF fails
-                    try:
-                        import PyPDF2
-                        logger.info("Falling back to PyPDF2 for text extraction")
-                        with open(temp_pdf_path, "rb") as pdf_file:
-                            pdf_reader = PyPDF2.PdfReader(pdf_file)
-                            fallback_text = ""
-                            for page_num in range(len(pdf_reader.pages)):
-                                page = pdf_reader.pages[page_num]
-                                fallback_text += page.extract_text() + "\n\n"
-                        
-                        logger.info(f"Extracted {len(fallback_text)} characters using PyPDF2 fallback")
-                        # Add extracted text to attachment data
-                        attachment['text_content'] = fallback_text
-                        attachment['extraction_method'] = 'PyPDF2_fallback'
-                    except Exception as fallback_err:
-                        logger.error(f"Fallback extraction also failed: {str(fallback_err)}")
-                finally:
-                    # Clean up the temporary file
-                    try:
-                        os.unlink(temp_pdf_path)
-                    except:
-                        pass
-            except ImportError:
-                logger.warning("PyMuPDF not installed. PDF text extraction will be skipped.")
-                logger.warning("Failed to extract text from PDF attachment due to missing dependencies")
-        
-        # Future extensions can be added here for other file types
-        elif 'xlsx' in content_type.lower() or 'excel' in content_type.lower():
-            # Process Excel files
-            try:                
-                logger.info(f"Extracting text from Excel file: {attachment_filename}")
-                
-                # Get the content as bytes
-                content = attachment.get('content')
-                if content:
+                except Exception as pandas_err:
+                    logger.error(f"Error reading Excel with pandas: {str(pandas_err)}")
+                    
+                    # Fallback to openpyxl
                     try:
-                        # First try to read directly from bytes using pandas
-                        excel_data = pd.read_excel(io.BytesIO(content))
-                        
-                        # Convert DataFrame to string representation
-                        text_content = ""
-                        
-                        # Add column headers
-                        headers = ", ".join(str(col) for col in excel_data.columns)
-                        text_content += f"Headers: {headers}\n\n"
-                        
-                        # Add rows as text
-                        for idx, row in excel_data.iterrows():
-                            row_text = f"Row {idx+1}: " + ", ".join(f"{col}: {val}" for col, val in row.items() if pd.notna(val))
-                            text_content += row_text + "\n"
-                        
-                        logger.info(f"Successfully extracted {len(text_content)} characters from Excel file")
-                        attachment['text_content'] = text_content
-                        attachment['extraction_method'] = 'pandas'
-                        
-                    except Exception as pandas_err:
-                        logger.error(f"Error reading Excel with pandas: {str(pandas_err)}")
-                        
-                        # Fallback to openpyxl
+                        # Open with openpyxl straight from memory; the workbook
+                        # is closed even if reading a sheet fails
+                        wb = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
                         try:
-                            
-                            # Save content to temp file
-                            with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as temp_excel:
-                                temp_excel.write(content)
-                                temp_excel_path = temp_excel.name
-                            
-                            # Open with openpyxl
-                            wb = openpyxl.load_workbook(temp_excel_path, data_only=True)
                             text_content = ""
                             
                             # Process each sheet
@@ -239,28 +250,82 @@ class EmailProcessor:
                                     if row_text.strip():
                                         text_content += row_text + "\n"
                                 text_content += "\n"
+                        finally:
+                            wb.close()
+                        
+                        logger.info(f"Successfully extracted {len(text_content)} characters using openpyxl fallback")
+                        attachment['text_content'] = text_content
+                        attachment['extraction_method'] = 'openpyxl_fallback'
                             
-                            logger.info(f"Successfully extracted {len(text_content)} characters using openpyxl fallback")
-                            attachment['text_content'] = text_content
-                            attachment['extraction_method'] = 'openpyxl_fallback'
-                            
-                            # Clean up temp file
-                            try:
-                                os.unlink(temp_excel_path)
-                            except:
-                                pass
-                                
-                        except Exception as openpyxl_err:
-                            logger.error(f"Openpyxl fallback also failed: {str(openpyxl_err)}")
-                else:
-                    logger.error("Excel file content is missing")
-                    
-            except ImportError as e:
-                logger.warning(f"Excel processing libraries not installed: {str(e)}")
-                logger.warning("Failed to extract text from Excel attachment due to missing dependencies")
-        # elif 'docx' in content_type.lower() or 'word' in content_type.lower():
-        #     # Process Word files
-        #     pass
+                    except Exception as openpyxl_err:
+                        logger.error(f"Openpyxl fallback also failed: {str(openpyxl_err)}")
+            else:
+                logger.error("Excel file content is missing")
+                
+        except ImportError as e:
+            logger.warning(f"Excel processing libraries not installed: {str(e)}")
+            logger.warning("Failed to extract text from Excel attachment due to missing dependencies")
+                
+    # Text extractors keyed by MIME type (without parameters), e.g. as
+    # returned by email.message.Message.get_content_type()
+    _TEXT_EXTRACTORS = {
+        "application/pdf": _extract_pdf_text,
+        "application/x-pdf": _extract_pdf_text,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": _extract_excel_text,
+        "application/vnd.ms-excel": _extract_excel_text,
+        "application/vnd.ms-excel.sheet.macroenabled.12": _extract_excel_text,
+        "application/excel": _extract_excel_text,
+        "application/x-excel": _extract_excel_text,
+    }
+    
+    async def _preprocess_attachment(self, attachment, attachment_idx=0, total_attachments=1):
+        """
+        Preprocess an attachment in the preprocessing thread pool.
+        
+        Args:
+            attachment: The attachment dictionary
+            attachment_idx: Index of the attachment for logging purposes
+            total_attachments: Total number of attachments for logging purposes
+            
+        Returns:
+            Tuple of (attachment with text_content added, attachment filename)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _preprocess_executor, self._preprocess_attachment_sync, attachment, attachment_idx, total_attachments
+        )
+        
+    def _preprocess_attachment_sync(self, attachment, attachment_idx=0, total_attachments=1):
+        """
+        Preprocess an attachment to extract its text content based on file type.
+        This function can be extended to support more file types in the future.
+        
+        Args:
+            attachment: The attachment dictionary
+            attachment_idx: Index of the attachment for logging purposes
+            total_attachments: Total number of attachments for logging purposes
+            
+        Returns:
+            Tuple of (attachment with text_content added, attachment filename)
+        """
+        attachment_filename = attachment.get('filename', f'attachment-{attachment_idx}')
+        logger.info(f"Processing attachment {attachment_idx+1}/{total_attachments}: {attachment_filename}")
+        
+        # Log detailed attachment info before processing
+        logger.info(f"  Filename: {attachment_filename}")
+        content_type = attachment.get('content_type', 'unknown')
+        logger.info(f"  Content type: {content_type}")
+        logger.info(f"  Size: {len(attachment.get('content', b''))} bytes")
+        
+        # If text content is already extracted, return as is
+        if 'text_content' in attachment:
+            logger.info(f"Attachment already has text content of {len(attachment['text_content'])} characters")
+            return attachment, attachment_filename
+            
+        # One lookup on the bare MIME type instead of a chain of substring scans
+        extractor = self._TEXT_EXTRACTORS.get(content_type.split(';', 1)[0].strip().lower())
+        if extractor is not None:
+            extractor(self, attachment, attachment_filename)
         
         # Ensure text_content exists, even if empty
         if 'text_content' not in attachment:
@@ -284,17 +349,15 @@ class EmailProcessor:
         """
         # STEP 1: Legal entity detection using the service layer
         logger.info(f"STEP 1: Starting legal entity detection for {source_name}")
-        detection_result = await self.legal_entity_lookup.detect_legal_entity(
-            email_body=email_text_content,
-            document_text=content_text
-        )
+        detection_result = await self._detect_legal_entity_cached(email_text_content, content_text)
         
         legal_entity_uuid = detection_result.get('legal_entity_uuid')
         group_uuid = detection_result.get('group_uuid')
         
         logger.info(f"Legal entity detection result: legal_entity_uuid={legal_entity_uuid}, group_uuid={group_uuid}")
         
-        # Update the email_log with group_uuid immediately if found
+        # Record the group_uuid on the email_log; process_email persists the
+        # consolidated list once all sources are processed
         if group_uuid:
             # Add the group_uuid to the email_log.group_uuids array if not already present
             if not email_log.group_uuids:
@@ -303,25 +366,26 @@ class EmailProcessor:
             if group_uuid not in email_log.group_uuids:
                 email_log.group_uuids.append(group_uuid)
                 logger.info(f"Added group_uuid {group_uuid} to email_log {email_log.email_log_uuid}")
-                
-                # Update the email_log in Firestore
-                await self.dao.update_document("email_log", email_log.email_log_uuid, {
-                    "group_uuids": email_log.group_uuids
-                })
-                logger.info(f"Updated email_log {email_log.email_log_uuid} with group_uuids: {email_log.group_uuids}")
         
         # STEP 2: Get the appropriate group processor
         logger.info(f"STEP 2: Getting group processor for {source_name} with group_uuid {group_uuid}")
        
         group_processor = GroupProcessorFactory.get_processor(group_uuid)
         logger.info(f"Using {group_processor.__class__.__name__} for processing {source_name}")
+        
+        # Extraction prompts are group-specific; without a dedicated processor
+        # there is nothing to extract, so skip the second LLM round-trip
+        if isinstance(group_processor, DefaultGroupProcessor):
+            logger.warning(f"No group-specific processor for {source_name}, skipping LLM extraction")
+            return []
 
         logger.info(f"STEP 3: Starting LLM extraction for {source_name} using {group_processor.__class__.__name__}")
         one_or_more_structured_payment_advices = await group_processor.process_payment_advice(
             attachment_text=content_text,
             email_body=email_text_content,
             attachment_obj=content_source,
-            attachment_file_format=content_source.get("content_type", "unknown")
+            attachment_file_format=content_source.get("content_type", "unknown"),
+            llm_response_cache=self.llm_response_cache
         )
 
         # Add the legal entity and group from step 1 to the llm_output
@@ -334,6 +398,53 @@ class EmailProcessor:
         logger.info(f"Successfully processed {source_name} with LLM")
         return one_or_more_structured_payment_advices
     
+    async def _process_attachments_batch(self, email_text_content, attachments, email_log,
+                                         max_concurrency=LLM_MAX_CONCURRENCY):
+        """
+        Process all attachments of an email concurrently for payment advice extraction.
+        
+        Each attachment is preprocessed and then run through legal entity
+        detection and group-specific extraction; at most max_concurrency
+        attachments are in the LLM stage at once.
+        
+        Args:
+            email_text_content: The email body text content
+            attachments: The attachment dictionaries of the email
+            email_log: The email log object to update
+            max_concurrency: Maximum number of attachments in the LLM stage at once
+            
+        Returns:
+            One entry per attachment, in attachment order: the list of structured
+            payment advices, or the exception raised while processing it
+        """
+        llm_semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _process_attachment(attachment_idx, attachment):
+            # Preprocess the attachment to extract text content
+            attachment, attachment_filename = await self._preprocess_attachment(attachment, attachment_idx, len(attachments))
+            
+            # Get the extracted text content
+            attachment_text = attachment.get('text_content', '') or ''
+            
+            # Process the attachment using the common helper function
+            async with llm_semaphore:
+                one_or_more_structured_payment_advices = await self._process_payment_advice_attachment_wise(
+                    email_text_content=email_text_content,
+                    content_source=attachment,
+                    content_text=attachment_text,
+                    source_name=f"attachment {attachment_filename}",
+                    email_log=email_log
+                )
+            
+            # Log summary of extracted LLM data
+            self._log_llm_output_summary(one_or_more_structured_payment_advices, f"attachment {attachment_filename}")
+            return one_or_more_structured_payment_advices
+            
+        return await asyncio.gather(
+            *(_process_attachment(idx, attachment) for idx, attachment in enumerate(attachments)),
+            return_exceptions=True
+        )
+    
     async def process_email(self, email_data: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
         """
         Process a single email.
@@ -347,11 +458,11 @@ class EmailProcessor:
         """
         try:
             # Extract email metadata
-            email_id = email_data.get("email_id", str(uuid.uuid4()))
+            email_id = email_data.get("email_id") or str(uuid.uuid4())
             sender = email_data.get("sender_mail")  # Fix: Use sender_mail instead of sender
             original_sender = email_data.get("original_sender_mail")  # Fix: Get original_sender_mail
             subject = email_data.get("subject", "(No Subject)")
-            received_at = email_data.get("received_at", datetime.utcnow())
+            received_at = email_data.get("received_at") or datetime.utcnow()
             
             logger.info(f"Processing email {email_id} from {sender}: {subject}")
             
@@ -361,20 +472,31 @@ class EmailProcessor:
             # Upload email content to GCS
             email_uuid = email_id
             raw_data = email_data.get("raw_data", b'')
-            text_content = email_data.get("text_content")
+            email_text_content = email_data.get("text_content") or ""
             html_content = email_data.get("html_content")
-            attachments = email_data.get("attachments")
-            
-            upload_result = self.gcs_uploader.upload_email_complete(
-                email_uuid=email_uuid,
-                raw_data=raw_data,
-                text_content=text_content,
-                html_content=html_content,
-                attachments=attachments
-            )
+            attachments = email_data.get("attachments") or []
             
-            if not upload_result:
-                raise Exception(f"Failed to upload email to GCS")
+            # Emails with neither attachments nor body text have nothing for the LLM
+            has_work = bool(attachments) or bool(email_text_content.strip())
+            
+            if has_work or raw_data:
+                # The GCS client is blocking; keep the event loop free for the
+                # other emails and attachments in flight
+                upload_result = await asyncio.to_thread(
+                    self.gcs_uploader.upload_email_complete,
+                    email_uuid=email_uuid,
+                    raw_data=raw_data,
+                    text_content=email_text_content,
+                    html_content=html_content,
+                    attachments=attachments
+                )
+                
+                if not upload_result:
+                    raise Exception(f"Failed to upload email to GCS")
+                gcs_folder_uri = upload_result.get("raw_path").split('/')[0]  # Extract folder path from raw_path
+            else:
+                logger.info(f"Email {email_id} has no content, skipping GCS upload")
+                gcs_folder_uri = None
             
             # Create EmailLog record
             email_log = EmailLog(
@@ -384,12 +506,27 @@ class EmailProcessor:
                 email_subject=subject,
                 mailbox_id=email_data.get("mailbox_id"),
                 received_at=received_at,
-                gcs_folder_uri=upload_result.get("raw_path").split('/')[0],  # Extract folder path from raw_path
+                gcs_folder_uri=gcs_folder_uri,
                 group_uuids=[],  # Will be populated during payment advice processing
             )
             
-            # Add EmailLog to Firestore
-            await self.dao.add_document("email_log", email_log.email_log_uuid, email_log.__dict__)
+            # Create processing log
+            processing_log = EmailProcessingLog(
+                email_log_uuid=email_log.email_log_uuid,
+                run_id="",  # Will be set by the BatchWorker later
+                processing_status=ProcessingStatus.EMAIL_RECEIVED if has_work else ProcessingStatus.SKIPPED
+            )
+            
+            # Add EmailLog and processing log to Firestore in one batched commit
+            doc_id = f"{email_log.email_log_uuid}"
+            await self.dao.batch_write([
+                ("set", "email_log", email_log.email_log_uuid, email_log),
+                ("set", "email_processing_log", doc_id, processing_log),
+            ])
+            
+            if not has_work:
+                logger.warning(f"Email {email_id} has no attachments and no text content, skipping LLM processing")
+                return email_log.email_log_uuid, []
             
             # Detailed logging of created EmailLog fields
             logger.info(f"Created email_log with the following details:")
@@ -402,24 +539,11 @@ class EmailProcessor:
             logger.info(f"  gcs_folder_uri: {email_log.gcs_folder_uri}")
             logger.info(f"  group_uuids: {email_log.group_uuids} (will be populated later)")
             
-            # Create processing log
-            processing_log = EmailProcessingLog(
-                email_log_uuid=email_log.email_log_uuid,
-                run_id="",  # Will be set by the BatchWorker later
-                processing_status=ProcessingStatus.EMAIL_RECEIVED
-            )
-            
-            # Add processing log to Firestore
-            doc_id = f"{email_log.email_log_uuid}"
-            await self.dao.add_document("email_processing_log", doc_id, processing_log.__dict__)
-            
-            # Get text content for LLM processing
-            email_text_content = email_data.get("text_content", "")
+            # Check the text content used for LLM processing
             if not email_text_content:
                 logger.warning(f"Email {email_id} has no text content. May affect extraction.")
             
             # Process attachments or email body directly
-            attachments = email_data.get("attachments", [])
             processed_attachments = 0
 
             # If no attachments, process the email body directly
@@ -429,7 +553,9 @@ class EmailProcessor:
                 # Process the email body using the common helper function
                 one_or_more_structured_payment_advices = await self._process_payment_advice_attachment_wise(
                     email_text_content=email_text_content,
-                    content_source="",
+                    # Text-only pseudo-attachment: the body is passed as email_text_content,
+                    # so no encoded copy of it is kept under 'content'
+                    content_source={"filename": "email_body", "content_type": "text/plain"},
                     content_text="",
                     source_name="email_body",
                     email_log=email_log
@@ -447,41 +573,30 @@ class EmailProcessor:
                 # Initialize list to store all attachment outputs if no body processing
                 all_structured_payment_advices = []
             
-            # Process each attachment if there are any
-            for attachment_idx, attachment in enumerate(attachments):
-                try:
-                    # Preprocess the attachment to extract text content
-                    attachment, attachment_filename = await self._preprocess_attachment(attachment, attachment_idx, len(attachments))
-                    
-                    # Get the extracted text content
-                    attachment_text = attachment.get('text_content', '') or ''
-                    
-                    # Process the attachment using the common helper function
-                    one_or_more_structured_payment_advices = await self._process_payment_advice_attachment_wise(
-                        email_text_content=email_text_content,
-                        content_source=attachment,
-                        content_text=attachment_text,
-                        source_name=f"attachment {attachment_filename}",
-                        email_log=email_log
-                    )
-                    
-                    # Log summary of extracted LLM data
-                    self._log_llm_output_summary(one_or_more_structured_payment_advices, f"attachment {attachment_filename}")
-                    
-                    # Add to list of outputs for further processing by the calling service
-                    all_structured_payment_advices.extend(one_or_more_structured_payment_advices)
-                    
-                    processed_attachments += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing attachment {attachment_idx} with LLM: {str(e)}")
+            # Process the attachments concurrently; the LLM calls are independent
+            # I/O, so the email takes as long as its slowest attachment
+            results = await self._process_attachments_batch(email_text_content, attachments, email_log)
+            
+            # Collect the outputs in attachment order for the calling service
+            for attachment_idx, result in enumerate(results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error processing attachment {attachment_idx} with LLM: {str(result)}")
+                    continue
+                all_structured_payment_advices.extend(result)
+                processed_attachments += 1
             
             logger.info(f"Successfully processed {processed_attachments}/{len(attachments)} attachments with LLM")
             
             # Update processing log status
             processing_log.processing_status = ProcessingStatus.LLM_READ
-            await self.dao.update_document("email_processing_log", doc_id, 
-                                          {"processing_status": ProcessingStatus.LLM_READ})
+            status_ops = [("update", "email_processing_log", doc_id, {"processing_status": ProcessingStatus.LLM_READ})]
+            
+            # Persist the group_uuids collected across all sources in the same commit
+            if email_log.group_uuids:
+                status_ops.append(("update", "email_log", email_log.email_log_uuid, {"group_uuids": email_log.group_uuids}))
+                logger.info(f"Updating email_log {email_log.email_log_uuid} with group_uuids: {email_log.group_uuids}")
+                
+            await self.dao.batch_write(status_ops)
             
             logger.info(f"Successfully processed email {email_log.email_log_uuid}")
             logger.info(f"Returning {len(all_structured_payment_advices)} structured payment advices for further processing")
@@ -493,7 +608,7 @@ class EmailProcessor:
             # Create error log
             try:
                 # Use the same email_log_uuid we generated earlier, or get it from data
-                error_email_uuid = email_data.get("email_id", str(uuid.uuid4()))
+                error_email_uuid = email_data.get("email_id") or str(uuid.uuid4())
                 processing_log = EmailProcessingLog(
                     email_log_uuid=error_email_uuid,
                     run_id="",  # Will be set by BatchWorker
@@ -503,7 +618,7 @@ class EmailProcessor:
                 
                 # Create processing log for error
                 doc_id = f"{error_email_uuid}"
-                await self.dao.add_document("email_processing_log", doc_id, processing_log.__dict__)
+                await self.dao.add_document("email_processing_log", doc_id, processing_log)
             except Exception as log_error:
                 logger.error(f"Failed to create error log: {str(log_error)}")
                 
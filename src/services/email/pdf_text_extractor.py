@@ -0,0 +1,123 @@
+"""PDF text extraction for email attachment preprocessing."""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Iterator, List, Optional
+
+import fitz
+
+from src.config import PDF_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# PDFs with at least this many pages have their text extracted in parallel.
+# PyMuPDF is not thread-safe, so page ranges go to separate worker processes.
+PARALLEL_PDF_MIN_PAGES = 8
+
+# PyMuPDF must not be used from several threads at once, even on different
+# documents, so in-process parsing is serialized
+_fitz_lock = threading.Lock()
+
+_pdf_executor: Optional[ProcessPoolExecutor] = None
+_pdf_executor_lock = threading.Lock()
+
+
+def _pdf_worker_count() -> int:
+    """Return the number of PDF worker processes, capped by PDF_MAX_WORKERS."""
+    return max(1, min(os.cpu_count() or 1, PDF_MAX_WORKERS))
+
+
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool used for PDF text extraction.
+
+    Workers are spawned rather than forked: the parent runs an event loop and
+    holds gRPC/HTTP client threads, which are not safe to fork.
+    """
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(
+                max_workers=_pdf_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_executor
+
+
+def shutdown_pdf_executor() -> None:
+    """Shut down the shared PDF process pool, if it was started."""
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is not None:
+            _pdf_executor.shutdown(wait=True)
+            _pdf_executor = None
+
+
+def _iter_pages_text(pdf_document, start: int, stop: int) -> Iterator[str]:
+    """Lazily yield the text of pages [start, stop) of an open PDF document."""
+    for page_num in range(start, stop):
+        # Extract text with better layout preservation
+        yield pdf_document.load_page(page_num).get_text("text")
+
+
+def _extract_pdf_page_range(pdf_bytes: bytes, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) of a PDF; runs in a worker process."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return list(_iter_pages_text(pdf_document, start, stop))
+
+
+def _collect_pages_text(pages: Iterator[str], max_chars: int) -> List[str]:
+    """Consume page texts until max_chars characters have been collected."""
+    pages_text = []
+    total_chars = 0
+    for page_text in pages:
+        pages_text.append(page_text)
+        total_chars += len(page_text)
+        if total_chars >= max_chars:
+            logger.warning(f"PDF text reached the {max_chars} character budget after {len(pages_text)} pages")
+            break
+    return pages_text
+
+
+def extract_pdf_pages_text(pdf_bytes: bytes, max_chars: Optional[int] = None,
+                           max_pages: Optional[int] = None) -> List[str]:
+    """
+    Extract the text of every page of a PDF, straight from memory.
+
+    Small PDFs are parsed in-process; PDFs with PARALLEL_PDF_MIN_PAGES or more
+    pages are split into page ranges across the worker process pool. With a
+    character budget, pages are parsed one at a time and parsing stops as soon
+    as the budget is reached, so the rest of the document is never extracted.
+
+    Args:
+        pdf_bytes: Raw PDF content
+        max_chars: Optional character budget for the extracted text
+        max_pages: Optional cap on the number of leading pages extracted
+
+    Returns:
+        List of page texts in page order
+    """
+    with _fitz_lock:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+            page_count = len(pdf_document)
+            if max_pages and page_count > max_pages:
+                logger.warning(f"PDF has {page_count} pages, extracting only the first {max_pages}")
+                page_count = max_pages
+
+            if max_chars:
+                return _collect_pages_text(_iter_pages_text(pdf_document, 0, page_count), max_chars)
+            if page_count < PARALLEL_PDF_MIN_PAGES:
+                return list(_iter_pages_text(pdf_document, 0, page_count))
+
+    workers = min(_pdf_worker_count(), page_count)
+    step = -(-page_count // workers)
+    starts = range(0, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
+    logger.info(f"Extracting {page_count} PDF pages across {len(starts)} worker processes")
+
+    chunks = _get_pdf_executor().map(_extract_pdf_page_range, repeat(pdf_bytes), starts, stops)
+    return [page_text for chunk in chunks for page_text in chunk]
@@ -1,32 +1,30 @@
 """
 Legal Entity Lookup Service - Compatibility Layer.
 
-This module provides backward compatibility for the original LegalEntityLookupService
-by delegating to the new modular implementation.
+This module keeps the original LegalEntityLookupService constructor, which
+builds its own repository and LLM client, on top of the modular
+LegalEntityService implementation.
 """
 
 import logging
-import os
-import asyncio
-from typing import Optional, Dict, Any, List
 
-from src.repositories.firestore_dao import FirestoreDAO
 from src.repositories.legal_entity_repository import LegalEntityRepository
 from src.external_apis.llm.legal_entity_client import LegalEntityLLMClient
-from src.services.legal_entity_service import LegalEntityService
+from src.services.legal_entity_service import DEFAULT_GROUP_UUID, LegalEntityService
 
-logger = logging.getLogger(__name__)
+# DEFAULT_GROUP_UUID is re-exported for callers that imported it from this module
+__all__ = ["LegalEntityLookupService", "DEFAULT_GROUP_UUID"]
 
-# Define a default group UUID
-DEFAULT_GROUP_UUID = "00000000-0000-0000-0000-000000000000"
+logger = logging.getLogger(__name__)
 
 
-class LegalEntityLookupService:
+class LegalEntityLookupService(LegalEntityService):
     """
-    Backward compatibility wrapper for legal entity lookup operations.
+    Backward compatible entry point for legal entity lookup operations.
     
-    This maintains the same public API as the original LegalEntityLookupService
-    but delegates to the new modular LegalEntityService implementation.
+    This maintains the same public API as the original LegalEntityLookupService.
+    Detection calls go straight to LegalEntityService rather than through a
+    delegating wrapper.
     """
     
     def __init__(self, dao=None, project_id=None, collection_prefix=""):
@@ -38,24 +36,5 @@ class LegalEntityLookupService:
             project_id: Firestore project ID. Required if dao is not provided.
             collection_prefix: Collection prefix for Firestore. Default is empty.
         """
-        # Create the new service that we'll delegate to
-        repository = LegalEntityRepository(dao)
-        llm_client = LegalEntityLLMClient()
-        self.service = LegalEntityService(repository, llm_client)
-        logger.info("Initialized LegalEntityLookupService (compatibility wrapper)")
-
-    async def detect_legal_entity(self, email_body: Optional[str] = None, document_text: Optional[str] = None) -> Dict[str, Any]:
-        """
-        Use LLM to detect the legal entity from email body and document text,
-        then look up its UUID and group UUID.
-        
-        Delegates to the new service implementation.
-        
-        Args:
-            email_body: Optional email body text
-            document_text: Optional document text (from attachment)
-            
-        Returns:
-            Dictionary with legal_entity_uuid and group_uuid
-        """
-        return await self.service.detect_legal_entity(email_body, document_text)
+        super().__init__(LegalEntityRepository(dao), LegalEntityLLMClient())
+        logger.info("Initialized LegalEntityLookupService (compatibility layer)")
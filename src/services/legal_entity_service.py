@@ -1,8 +1,11 @@
 """Business logic for legal entity operations."""
 
+import asyncio
 import logging
+import re
 from typing import Dict, Any, Optional, List
 
+from src.config import LEGAL_ENTITY_LLM_MAX_CONCURRENCY
 from src.repositories.legal_entity_repository import LegalEntityRepository
 from src.external_apis.llm.legal_entity_client import LegalEntityLLMClient
 
@@ -11,6 +14,11 @@ logger = logging.getLogger(__name__)
 # Define a default group UUID
 DEFAULT_GROUP_UUID = "00000000-0000-0000-0000-000000000000"
 
+# Zepto/Kiranakart keyword checks for the hardcoded fallbacks; searching
+# case-insensitively avoids upper-casing whole documents
+_ZEPTO_KEYWORDS_RE = re.compile(r"KIRANAKART|ZEPTO", re.IGNORECASE)
+_KIRANAKART_TECHNOLOGIES_RE = re.compile(r"KIRANAKART TECHNOLOGIES", re.IGNORECASE)
+
 
 class LegalEntityService:
     """
@@ -20,18 +28,94 @@ class LegalEntityService:
     connecting the repository layer with the LLM client.
     """
     
-    def __init__(self, repository: LegalEntityRepository, llm_client: LegalEntityLLMClient):
+    def __init__(self, repository: LegalEntityRepository, llm_client: LegalEntityLLMClient,
+                 max_concurrency: int = LEGAL_ENTITY_LLM_MAX_CONCURRENCY):
         """
         Initialize the legal entity service.
         
         Args:
             repository: Legal entity repository for database operations
             llm_client: LLM client for entity detection
+            max_concurrency: Maximum number of detection LLM calls in flight
         """
         self.repository = repository
         self.llm_client = llm_client
+        self._llm_semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # Name -> entity index (alternate names included) and the name list for
+        # the LLM prompt, rebuilt only when the repository reloads its catalog
+        self._catalog_version = -1
+        self._entity_by_name: Dict[str, Dict[str, Any]] = {}
+        self._legal_entity_names: List[str] = []
+        # Kiranakart entities, found once per catalog for the Zepto special cases
+        self._kiranakart_uuids: set = set()
+        self._kiranakart_fallback_entity: Optional[Dict[str, Any]] = None
         logger.info("Initialized LegalEntityService")
     
+    def _refresh_name_index(self, all_entities: List[Dict[str, Any]]) -> None:
+        """
+        Rebuild the name index if the repository catalog changed since the last build.
+        
+        Args:
+            all_entities: Legal entities as returned by the repository
+        """
+        if self._catalog_version == self.repository.version:
+            return
+            
+        # Map each entity's name and alternate names to the entity; on a
+        # collision the later name wins, as in catalog order
+        entity_by_name = {
+            name: entity
+            for entity in all_entities
+            for name in (entity.get("legal_entity_name"), *(entity.get("alternate_names") or ()))
+            if name and isinstance(name, str)
+        }
+                    
+        # Case-fold the entity names for the Zepto checks once, not per detection
+        kiranakart_uuids = set()
+        kiranakart_fallback_entity = None
+        for entity in all_entities:
+            name_upper = entity.get("legal_entity_name", "").upper()
+            if name_upper.startswith("KIRANAKART"):
+                kiranakart_uuids.add(entity.get("legal_entity_uuid"))
+            if kiranakart_fallback_entity is None and "KIRANAKART" in name_upper:
+                kiranakart_fallback_entity = entity
+                
+        self._kiranakart_uuids = kiranakart_uuids
+        self._kiranakart_fallback_entity = kiranakart_fallback_entity
+        self._entity_by_name = entity_by_name
+        self._legal_entity_names = list(entity_by_name.keys())
+        self._catalog_version = self.repository.version
+    
+    def _entity_result(self, matched_entity: Dict[str, Any], detected_name: str) -> Dict[str, Any]:
+        """
+        Build the detection result for a matched entity, applying the Zepto group override.
+        
+        Args:
+            matched_entity: Legal entity the detected name resolved to
+            detected_name: Name the entity was detected under
+            
+        Returns:
+            Dictionary with legal_entity_uuid and group_uuid
+        """
+        legal_entity_uuid = matched_entity.get("legal_entity_uuid")
+        group_uuid = matched_entity.get("group_uuid", DEFAULT_GROUP_UUID)
+        
+        logger.info("Matched entity to UUID '%s' and group UUID '%s'", legal_entity_uuid, group_uuid)
+        
+        # Special case for hardcoded Zepto entity (temporary fix)
+        if _KIRANAKART_TECHNOLOGIES_RE.search(detected_name) or legal_entity_uuid in self._kiranakart_uuids:
+            logger.info("Detected Kiranakart/Zepto entity, ensuring correct group association")
+            # If this is the Zepto entity, make sure we have the right group UUID
+            if group_uuid == DEFAULT_GROUP_UUID:
+                zepto_group_uuid = "group-zepto-67890"
+                logger.info("Setting Zepto group UUID explicitly to %s", zepto_group_uuid)
+                group_uuid = zepto_group_uuid
+        
+        return {
+            "legal_entity_uuid": legal_entity_uuid,
+            "group_uuid": group_uuid
+        }
     
     async def detect_legal_entity(self, email_body: Optional[str] = None, document_text: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -57,94 +141,64 @@ class LegalEntityService:
         try:
             # Get all legal entities from repository
             all_entities = await self.repository.fetch_all_legal_entities()
-            logger.info(f"Retrieved {len(all_entities)} legal entities from repository")
+            logger.info("Retrieved %d legal entities from repository", len(all_entities))
             
-            # Create a mapping from name to entity for easier lookup
-            entity_by_name = {}
-            for entity in all_entities:
-                legal_entity_name = entity.get("legal_entity_name")
-                if legal_entity_name:
-                    entity_by_name[legal_entity_name] = entity
-                    
-                # Also map alternate names to the same entity
-                alternate_names = entity.get("alternate_names", [])
-                for alt_name in alternate_names:
-                    if alt_name and isinstance(alt_name, str):
-                        entity_by_name[alt_name] = entity
+            self._refresh_name_index(all_entities)
+            entity_by_name = self._entity_by_name
             
-            legal_entity_names = list(entity_by_name.keys())
-            logger.info(f"Prepared {len(legal_entity_names)} legal entity names (including alternates) for detection")
+            # A document naming exactly one known legal entity by its full legal
+            # name needs no LLM call; email bodies and bare alternate names are
+            # too loose (signatures, forwarded threads, short brand names)
+            if document_text:
+                mentioned = await self.repository.find_legal_entities_in_text(
+                    document_text, include_alternate_names=False
+                )
+                if len(mentioned) == 1:
+                    logger.info("Document names a single known legal entity '%s', skipping LLM detection",
+                                mentioned[0].get("legal_entity_name"))
+                    return self._entity_result(mentioned[0], mentioned[0].get("legal_entity_name", ""))
+            
+            legal_entity_names = self._legal_entity_names
+            logger.info("Prepared %d legal entity names (including alternates) for detection", len(legal_entity_names))
             
             # Call LLM to detect legal entity
-            detected_name = await self.llm_client.detect_legal_entity(
-                legal_entity_names=legal_entity_names,
-                email_body=email_body,
-                document_text=document_text
-            )
+            async with self._llm_semaphore:
+                detected_name = await self.llm_client.detect_legal_entity(
+                    legal_entity_names=legal_entity_names,
+                    email_body=email_body,
+                    document_text=document_text
+                )
             
-            logger.info(f"LLM returned detected entity name: '{detected_name}'")
+            logger.info("LLM returned detected entity name: '%s'", detected_name)
             
             # If a valid entity was detected, look up its UUID and group UUID
             if detected_name and detected_name != "UNKNOWN":
                 # Try direct lookup first
                 matched_entity = entity_by_name.get(detected_name)
                 
-                # If not found, try case-insensitive matching
+                # If not found, use the repository's index of normalized names: a
+                # dict hit for case/punctuation variants, then (memoized) fuzzy matching
                 if not matched_entity:
-                    logger.info(f"No exact match for '{detected_name}', trying case-insensitive matching")
-                    detected_name_lower = detected_name.lower()
-                    
-                    # Try direct case-insensitive match
-                    for name, entity in entity_by_name.items():
-                        if name.lower() == detected_name_lower:
-                            logger.info(f"Found case-insensitive match: '{detected_name}' ~ '{name}'")
-                            matched_entity = entity
-                            break
-                    
-                    # Try fuzzy matching if still not found
-                    if not matched_entity:
-                        logger.info("No case-insensitive match, trying fuzzy matching")
-                        for name, entity in entity_by_name.items():
-                            if detected_name_lower in name.lower() or name.lower() in detected_name_lower:
-                                logger.info(f"Found fuzzy match: '{detected_name}' ~ '{name}'")
-                                matched_entity = entity
-                                break
+                    logger.info("No exact match for '%s', trying normalized and fuzzy matching", detected_name)
+                    matched_entity = await self.repository.get_legal_entity_by_name(detected_name)
                 
                 # If we found a match, return its details
                 if matched_entity:
-                    legal_entity_uuid = matched_entity.get("legal_entity_uuid")
-                    group_uuid = matched_entity.get("group_uuid", DEFAULT_GROUP_UUID)
-                    
-                    logger.info(f"Matched entity to UUID '{legal_entity_uuid}' and group UUID '{group_uuid}'")
-                    
-                    # Special case for hardcoded Zepto entity (temporary fix)
-                    if "KIRANAKART TECHNOLOGIES" in detected_name.upper() or matched_entity.get("legal_entity_name", "").upper().startswith("KIRANAKART"):
-                        logger.info("Detected Kiranakart/Zepto entity, ensuring correct group association")
-                        # If this is the Zepto entity, make sure we have the right group UUID
-                        if group_uuid == DEFAULT_GROUP_UUID:
-                            zepto_group_uuid = "group-zepto-67890"
-                            logger.info(f"Setting Zepto group UUID explicitly to {zepto_group_uuid}")
-                            group_uuid = zepto_group_uuid
-                    
-                    return {
-                        "legal_entity_uuid": legal_entity_uuid,
-                        "group_uuid": group_uuid
-                    }          
+                    return self._entity_result(matched_entity, detected_name)
             # If no entity detected or not found in repository
             logger.warning(f"Could not map detected entity '{detected_name}' to a known legal entity")
             
             # Check if the document text contains known keywords for Zepto/Kiranakart
-            if document_text and ("KIRANAKART" in document_text.upper() or "ZEPTO" in document_text.upper()):
+            if document_text and _ZEPTO_KEYWORDS_RE.search(document_text):
                 logger.info("Document contains Zepto/Kiranakart keywords, using hardcoded fallback")
-                for entity in all_entities:
-                    if "KIRANAKART" in entity.get("legal_entity_name", "").upper():
-                        legal_entity_uuid = entity.get("legal_entity_uuid")
-                        group_uuid = "group-zepto-67890" # Hardcoded for safety
-                        logger.info(f"Using hardcoded fallback: legal_entity_uuid={legal_entity_uuid}, group_uuid={group_uuid}")
-                        return {
-                            "legal_entity_uuid": legal_entity_uuid,
-                            "group_uuid": group_uuid
-                        }
+                if self._kiranakart_fallback_entity is not None:
+                    legal_entity_uuid = self._kiranakart_fallback_entity.get("legal_entity_uuid")
+                    group_uuid = "group-zepto-67890" # Hardcoded for safety
+                    logger.info("Using hardcoded fallback: legal_entity_uuid=%s, group_uuid=%s", legal_entity_uuid, group_uuid)
+                    return {
+                        "legal_entity_uuid": legal_entity_uuid,
+                        "group_uuid": group_uuid
+                    }
             
             return {
                 "legal_entity_uuid": None,
@@ -152,13 +206,11 @@ class LegalEntityService:
             }
             
         except Exception as e:
-            logger.error(f"Error during legal entity detection: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error during legal entity detection: %s", e)
         
             # Add emergency Zepto detection as fallback
             try:
-                if document_text and ("KIRANAKART" in document_text.upper() or "ZEPTO" in document_text.upper()):
+                if document_text and _ZEPTO_KEYWORDS_RE.search(document_text):
                     logger.info("Exception occurred but document contains Zepto keywords, using emergency fallback")
                     return {
                         "legal_entity_uuid": "kiranakart-technologies-12345",
@@ -171,3 +223,7 @@ class LegalEntityService:
             "legal_entity_uuid": None,
             "group_uuid": DEFAULT_GROUP_UUID
         }
+        
+    async def aclose(self) -> None:
+        """Release the pooled HTTP connections of the LLM client."""
+        await self.llm_client.aclose()
@@ -137,7 +137,8 @@ class MonitoringService:
             # Get the email log
             email_log = await self.dao.get_email_log(email_log_uuid)
             
-            logger.info(f"DEBUG - Retrieved email log: {json.dumps(email_log, default=str)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Retrieved email log: %s", json.dumps(email_log, default=str))
             
             if not email_log:
                 logger.error(f"Email log {email_log_uuid} not found")
@@ -146,7 +147,8 @@ class MonitoringService:
             # Get payment advices for this email log
             payment_advices = await self.dao.get_payment_advices_by_email_log(email_log_uuid)
             
-            logger.info(f"DEBUG - Retrieved payment advices: {json.dumps(payment_advices, default=str)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Retrieved payment advices: %s", json.dumps(payment_advices, default=str))
             
             # Join data from email log and payment advices
             entries = []
@@ -184,7 +186,8 @@ class MonitoringService:
                     "processed_at": payment_advice.get("created_at")
                 }
                 entries.append(entry)
-                logger.info(f"DEBUG - Created entry for sheet: {json.dumps(entry, default=str)}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Created entry for sheet: %s", json.dumps(entry, default=str))
             
             # Update the sheet
             logger.info(f"Updating monitoring sheet with {len(entries)} entries for email log {email_log_uuid}")
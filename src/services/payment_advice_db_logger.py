@@ -7,12 +7,12 @@ import json
 import logging
 import uuid
 import traceback
-from datetime import datetime
 from typing import Dict, Any, List, Optional
 
 from src.models.schemas import PaymentAdvice, PaymentAdviceLine, PaymentAdviceStatus
 from src.repositories.payment_advice_repository import PaymentAdviceRepository
 from src.repositories.firestore_dao import FirestoreDAO
+from src.repositories.batched_writer import BatchedWriter
 
 logger = logging.getLogger(__name__)
 
@@ -120,13 +120,17 @@ class PaymentAdviceDbLogger:
         # Set initial payment advice status to LLM_READ after creation
         payment_advice.payment_advice_status = PaymentAdviceStatus.LLM_READ
         
+        # The advice and its status update below carry one shared timestamp
+        writer = BatchedWriter()
+        
         # Save the payment advice to the repository
-        await self.payment_advice_repo.create(payment_advice)
+        await writer.create(self.payment_advice_repo, payment_advice)
         logger.info(f"Created payment advice {payment_advice_uuid} for email log {email_log_uuid} with status {payment_advice.payment_advice_status.value}")
         
-        # Log full LLM output for debugging
-        logger.info(f"FULL LLM OUTPUT: {json.dumps(llm_output, default=str)}")
-        logger.info(f"LLM OUTPUT KEYS: {list(llm_output.keys())}")
+        # Log full LLM output for debugging; serializing it is only worth it at DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("FULL LLM OUTPUT: %s", json.dumps(llm_output, default=str))
+        logger.info("LLM OUTPUT KEYS: %s", list(llm_output))
         
         # Process payment advice lines if available
         if "paymentadvice_lines" in llm_output and llm_output["paymentadvice_lines"]:
@@ -137,9 +141,8 @@ class PaymentAdviceDbLogger:
             await self.save_payment_advice_lines(payment_advice_lines, payment_advice_uuid)
             
             # Update payment advice status to POST_PROCESSING_COMPLETED after lines are saved
-            await self.payment_advice_repo.update(payment_advice_uuid, {
-                "payment_advice_status": PaymentAdviceStatus.POST_PROCESSING_COMPLETED.value,
-                "updated_at": datetime.utcnow()
+            await writer.update(self.payment_advice_repo, payment_advice_uuid, {
+                "payment_advice_status": PaymentAdviceStatus.POST_PROCESSING_COMPLETED.value
             })
             logger.info(f"Updated payment advice {payment_advice_uuid} status to {PaymentAdviceStatus.POST_PROCESSING_COMPLETED.value}")
         else:
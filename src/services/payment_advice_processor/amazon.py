@@ -3,7 +3,6 @@ from src.external_apis.llm.constants import (
     META_PAYER_LEGAL_NAME,
     META_PAYMENT_ADVICE_DATE
 )
-from src.repositories.firestore_dao import FirestoreDAO
 import logging
 import json
 import re
@@ -27,7 +26,7 @@ class AmazonGroupProcessor(GroupProcessor):
         """Get the Amazon-specific prompt template."""
         return AMAZON_PROMPT
     
-    async def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str) -> Dict[str, Any]:
+    async def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str, llm_response_cache=None) -> Dict[str, Any]:
         """
         Process payment advice using LLM extraction with Amazon-specific logic.
         
@@ -36,6 +35,7 @@ class AmazonGroupProcessor(GroupProcessor):
             email_body: Email body text for additional context
             attachment_obj: Dictionary with attachment metadata
             attachment_file_format: Format of the attachment file
+            llm_response_cache: Optional LLMResponseCacheRepository for reusing extraction responses
             
         Returns:
             List of processed payment advice dictionaries
@@ -46,7 +46,7 @@ class AmazonGroupProcessor(GroupProcessor):
         from src.external_apis.llm.client import LLMClient
         
         # Initialize the LLM client
-        llm_client = LLMClient()
+        llm_client = LLMClient(response_cache=llm_response_cache)
         
         # Get the prompt template for Amazon
         prompt_text = self.get_prompt_template()
@@ -70,7 +70,8 @@ class AmazonGroupProcessor(GroupProcessor):
                 system_prompt=prompt_text,
                 user_content=full_text,
                 temperature=0.0,
-                timeout=90.0
+                timeout=90.0,
+                prompt_cache_key=f"payment-advice-{self.get_group_name().lower()}"
             )
             
             response_text = llm_result["response_text"]
@@ -144,34 +145,11 @@ class AmazonGroupProcessor(GroupProcessor):
             
             logger.info(f"Processing {len(l2_table)} rows from L2 table")
             
-            # First, collect all TDS entries to calculate their sum
-            tds_entries = []
+            # TDS rows are summed into one aggregated entry in the same pass that
+            # builds the other lines
             total_tds_amount = 0
             
-            # Identify and sum all TDS entries
-            for row in l2_table:
-                invoice_description = row.get("invoice_description", "")
-                amount_paid = row.get("amount_paid", 0)
-                
-                # Skip rows with None/null amount paid
-                if amount_paid is None:
-                    continue
-                    
-                # Convert amount_paid to float if it's a string
-                if isinstance(amount_paid, str):
-                    try:
-                        # Remove commas and convert to float
-                        amount_paid = float(amount_paid.replace(",", ""))
-                    except ValueError:
-                        logger.warning(f"Could not convert amount_paid to float: {amount_paid}")
-                        amount_paid = 0
-                
-                # Identify TDS entries
-                if invoice_description and "tds" in invoice_description.lower():
-                    tds_entries.append(row)
-                    total_tds_amount += amount_paid
-            
-            # Process non-TDS entries
+            # Process each row once
             for row in l2_table:
                 invoice_number = row.get("invoice_number")
                 invoice_description = row.get("invoice_description", "")
@@ -192,8 +170,12 @@ class AmazonGroupProcessor(GroupProcessor):
                 
                 abs_amount = abs(amount_paid)
                 
-                # Skip TDS entries - will handle them separately with aggregated total
-                if invoice_description and "tds" in invoice_description.lower():
+                # Lowercase the description once for all the keyword checks below
+                description_lower = invoice_description.lower() if invoice_description else ""
+                
+                # TDS entries are not lines of their own - accumulate them for the aggregated total
+                if "tds" in description_lower:
+                    total_tds_amount += amount_paid
                     continue
                 
                 # Default values for all document types
@@ -207,7 +189,7 @@ class AmazonGroupProcessor(GroupProcessor):
                 
                 # 1. BDPO - Identified by "Co-op" in description
                 keyword_list = ["co-op"]
-                if invoice_description and any(keyword in invoice_description.lower() for keyword in keyword_list):
+                if any(keyword in description_lower for keyword in keyword_list):
                     doc_type = "BDPO"
                     ref_1 = doc_number
                     ref_2 = ref_1
@@ -219,17 +201,17 @@ class AmazonGroupProcessor(GroupProcessor):
                 # 2. RTV/Credit note - Identified by "RTV" or "VRET" or negative amount not TDS/BDPO
                 keyword_list = ["rtv", "vret in credit", "contra"]
                 negative_keyword_list = ["tds", "co-op", "bank receipt", "invoice"]
-                if invoice_description and any(keyword in invoice_description.lower() for keyword in keyword_list) and not any(keyword in invoice_description.lower() for keyword in negative_keyword_list):
+                if any(keyword in description_lower for keyword in keyword_list) and not any(keyword in description_lower for keyword in negative_keyword_list):
                     doc_type = "Credit Note"
                     ref_1 = doc_number
-                    ref_2 = ref_1.split('-')[-1] if "vret" in invoice_description.lower() else ref_1
+                    ref_2 = ref_1.split('-')[-1] if "vret" in description_lower else ref_1
                     ref_3 = "RTV"
                     dr_cr = "Dr"  # Always Debit per requirements
                     dr_amt = abs_amount
                     cr_amt = 0
                 
                 # 3. Bank Receipt - Identified by "Bank Receipt" in description
-                elif invoice_description and "bank receipt" in invoice_description.lower():
+                elif "bank receipt" in description_lower:
                     doc_type = "Bank Receipt"
                     doc_number = payment_advice_number
                     ref_1 = doc_number
@@ -278,10 +260,10 @@ class AmazonGroupProcessor(GroupProcessor):
                 }
                 
                 paymentadvice_lines.append(line_entry)
-                logger.info(f"Created Amazon OP table entry: {line_entry}")
+                logger.info("Created Amazon OP table entry: %s", line_entry)
             
             # Add a single aggregated TDS entry if TDS entries exist
-            if tds_entries and total_tds_amount != 0:
+            if total_tds_amount != 0:
                 # TDS logic per requirements
                 doc_type = "TDS"
                 doc_number = payment_advice_number
@@ -339,13 +321,6 @@ class AmazonGroupProcessor(GroupProcessor):
             
             # Create and save PaymentAdviceLine objects to Firestore
             try:
-                # Initialize the DAO with the appropriate collection prefix (if test mode is detected)
-                collection_prefix = ""
-                if processed_output.get("is_test", False):
-                    collection_prefix = "dev_"
-                    
-                dao = FirestoreDAO(collection_prefix=collection_prefix)
-                
                 # Create and save each payment advice line
                 payment_advice_uuid = processed_output.get("payment_advice_uuid")
                 if not payment_advice_uuid:
@@ -8,7 +8,7 @@ class GroupProcessor(ABC):
     """Abstract base class for group-specific processing logic."""
     
     @abstractmethod
-    def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str) -> Dict[str, Any]:
+    def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str, llm_response_cache=None) -> Dict[str, Any]:
         """
         Process the payment advice.
         
@@ -17,6 +17,7 @@ class GroupProcessor(ABC):
             email_body: Email body text
             attachment_obj: Dictionary with attachment metadata
             attachment_file_format: Format of the attachment file
+            llm_response_cache: Optional LLMResponseCacheRepository for reusing extraction responses
             
         Returns:
             Processed payment advice dictionary
@@ -12,6 +12,9 @@ from src.config import CLIENT_ID
 
 logger = logging.getLogger(__name__)
 
+# Substrings of an attachment's content type that mark it as an Excel workbook
+_EXCEL_FORMAT_KEYWORDS = ("excel", "spreadsheet", "xlsx")
+
 class HOTGroupProcessor(GroupProcessor):
     """HandsOnTrade-specific group processor for Excel attachments that contain multiple payment advices."""
     
@@ -34,7 +37,7 @@ class HOTGroupProcessor(GroupProcessor):
         return len(set_1.intersection(set_2)) > 2
             
     
-    async def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str) -> List[Dict[str, Any]]:
+    async def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str, llm_response_cache=None) -> List[Dict[str, Any]]:
         """
         Process payment advice for HOT with Excel attachment handling.
         
@@ -43,6 +46,7 @@ class HOTGroupProcessor(GroupProcessor):
             email_body: Email body text for additional context
             attachment_obj: Dictionary with attachment metadata
             attachment_file_format: Format of the attachment file
+            llm_response_cache: Unused; HOT payment advices are parsed without the LLM
             
         Returns:
             List of processed payment advice dictionaries
@@ -53,9 +57,8 @@ class HOTGroupProcessor(GroupProcessor):
         # Check if this is an Excel file by file format or extension
         is_excel = False
         if attachment_file_format:
-            is_excel = ('excel' in attachment_file_format.lower() or 
-                      'spreadsheet' in attachment_file_format.lower() or
-                      'xlsx' in attachment_file_format.lower())
+            file_format = attachment_file_format.lower()
+            is_excel = any(keyword in file_format for keyword in _EXCEL_FORMAT_KEYWORDS)
         if not is_excel and filename:
             is_excel = filename.endswith(('.xlsx', '.xls'))
         
@@ -1,7 +1,7 @@
 """Group-specific factory pattern for LLM extraction and processing."""
 
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from src.services.payment_advice_processor.base_processor import GroupProcessor
 from src.services.payment_advice_processor.constants import GROUP_UUIDS
 
@@ -10,7 +10,7 @@ logger = logging.getLogger(__name__)
 class DefaultGroupProcessor(GroupProcessor):
     """Default group processor when no specific group is identified."""
     
-    def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str) -> Dict[str, Any]:
+    def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str, llm_response_cache=None) -> Dict[str, Any]:
         """Process the payment advice."""
         return None
         
@@ -26,6 +26,28 @@ class DefaultGroupProcessor(GroupProcessor):
 class GroupProcessorFactory:
     """Factory class for creating group-specific processors."""
     
+    # Group UUID -> processor class, built on first use
+    _processor_map: Optional[Dict[str, type]] = None
+    # Processors keep no per-call state, so one instance per group is reused
+    _processors: Dict[str, GroupProcessor] = {}
+    _default_processor: Optional[GroupProcessor] = None
+    
+    @classmethod
+    def _get_processor_map(cls) -> Dict[str, type]:
+        """Return the group UUID to processor class map, building it once."""
+        if cls._processor_map is None:
+            # Import at runtime to avoid circular imports
+            from src.services.payment_advice_processor.amazon import AmazonGroupProcessor
+            from src.services.payment_advice_processor.zepto import ZeptoGroupProcessor
+            from src.services.payment_advice_processor.blinkit_hot import HOTGroupProcessor
+            
+            cls._processor_map = {
+                GROUP_UUIDS["amazon"]: AmazonGroupProcessor,
+                GROUP_UUIDS["zepto"]: ZeptoGroupProcessor,
+                GROUP_UUIDS["hot"]: HOTGroupProcessor,
+            }
+        return cls._processor_map
+    
     @classmethod
     def get_processor(cls, group_uuid: str) -> GroupProcessor:
         """
@@ -37,25 +59,19 @@ class GroupProcessorFactory:
         Returns:
             An instance of the appropriate GroupProcessor
         """
-        # Import at runtime to avoid circular imports
-        from src.services.payment_advice_processor.amazon import AmazonGroupProcessor
-        from src.services.payment_advice_processor.zepto import ZeptoGroupProcessor
-        from src.services.payment_advice_processor.blinkit_hot import HOTGroupProcessor
-        
-        # Create processor map dynamically
-        processor_map = {
-            GROUP_UUIDS["amazon"]: AmazonGroupProcessor,
-            GROUP_UUIDS["zepto"]: ZeptoGroupProcessor,
-            GROUP_UUIDS["hot"]: HOTGroupProcessor,
-        }
-        
-        if not group_uuid or group_uuid not in processor_map:
-            logger.warning(f"No processor found for group_uuid={group_uuid}, using default")
-            return DefaultGroupProcessor()
+        processor = cls._processors.get(group_uuid) if group_uuid else None
+        if processor is None:
+            processor_map = cls._get_processor_map()
+            if not group_uuid or group_uuid not in processor_map:
+                logger.warning(f"No processor found for group_uuid={group_uuid}, using default")
+                if cls._default_processor is None:
+                    cls._default_processor = DefaultGroupProcessor()
+                return cls._default_processor
+                
+            processor = cls._processors[group_uuid] = processor_map[group_uuid]()
 
-        processor_class = processor_map[group_uuid]
-        logger.info(f"Using {processor_class.__name__} for group_uuid={group_uuid}")
-        return processor_class()
+        logger.info(f"Using {processor.__class__.__name__} for group_uuid={group_uuid}")
+        return processor
     
     @classmethod
     def register_processor(cls, group_uuid: str, processor_class: type) -> None:
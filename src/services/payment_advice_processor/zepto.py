@@ -389,7 +389,7 @@ class ZeptoGroupProcessor(GroupProcessor):
             logger.error(f"Traceback: {traceback.format_exc()}")
             return processed_output  # Return original output on error
 
-    async def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str) -> Dict[str, Any]:
+    async def process_payment_advice(self, attachment_text: str, email_body: str, attachment_obj: Dict[str, Any], attachment_file_format: str, llm_response_cache=None) -> Dict[str, Any]:
         """
         Process payment advice using LLM extraction with Zepto-specific logic.
         
@@ -398,6 +398,7 @@ class ZeptoGroupProcessor(GroupProcessor):
             email_body: Email body text for additional context
             attachment_obj: Dictionary with attachment metadata
             attachment_file_format: Format of the attachment file
+            llm_response_cache: Optional LLMResponseCacheRepository for reusing extraction responses
             
         Returns:
             List of processed payment advice dictionaries
@@ -410,7 +411,7 @@ class ZeptoGroupProcessor(GroupProcessor):
         import re
         
         # Initialize the LLM client
-        llm_client = LLMClient()
+        llm_client = LLMClient(response_cache=llm_response_cache)
         
         # Get the prompt template for Zepto
         prompt_text = self.get_prompt_template()
@@ -434,7 +435,8 @@ class ZeptoGroupProcessor(GroupProcessor):
                 system_prompt=prompt_text,
                 user_content=full_text,
                 temperature=0.0,
-                timeout=90.0
+                timeout=90.0,
+                prompt_cache_key=f"payment-advice-{self.get_group_name().lower()}"
             )
             
             response_text = llm_result["response_text"]
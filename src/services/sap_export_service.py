@@ -1,9 +1,10 @@
 """Service for generating and uploading SAP-compatible XLSX exports."""
 
+import asyncio
+import io
 import logging
 import pandas as pd
 import os
-import tempfile
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from uuid import uuid4
@@ -16,6 +17,8 @@ from src.models.schemas import PaymentAdvice, PaymentAdviceLine
 
 logger = logging.getLogger(__name__)
 
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 class SAPExportService:
     """Service for generating and uploading SAP-compatible XLSX exports from payment advice lines."""
     
@@ -213,18 +216,58 @@ class SAPExportService:
             
         return sap_rows
             
+    @staticmethod
+    def _build_sap_workbook(sap_rows: List[Dict[str, Any]]) -> bytes:
+        """
+        Serialize SAP rows to an in-memory XLSX workbook.
+        
+        Args:
+            sap_rows: Rows in SAP export format
+            
+        Returns:
+            Content of the XLSX file
+        """
+        # Create DataFrame
+        df = pd.DataFrame(sap_rows)
+        
+        # Write DataFrame to Excel without index and without header row,
+        # formatting the sheet before the workbook is saved
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            df.to_excel(writer, sheet_name="Sheet1", index=False, header=False)
+            
+            # Optional: Format numbers to avoid scientific notation
+            try:
+                ws = writer.sheets["Sheet1"]
+                
+                # Format number columns properly
+                for row in ws.iter_rows(min_row=2):
+                    # Debit Amount column
+                    if row[17].value and row[17].value != "":
+                        row[17].number_format = '#,##0.00'
+                    
+                    # Credit Amount column
+                    if row[18].value and row[18].value != "":
+                        row[18].number_format = '#,##0.00'
+            except Exception as e:
+                logger.warning(f"Error formatting Excel: {str(e)}")
+                # Continue without formatting - the basic export will still work
+        return buffer.getvalue()
+        
     async def generate_sap_excel(
         self, 
         payment_advice_uuid: str
-    ) -> Tuple[Optional[str], Optional[str]]:
+    ) -> Tuple[Optional[bytes], Optional[str]]:
         """
         Generate SAP Excel file for a payment advice.
         
+        The workbook is built and formatted in memory; nothing is written to disk.
+        
         Args:
             payment_advice_uuid: UUID of the payment advice
             
         Returns:
-            Tuple of (local file path, filename) if successful, (None, None) otherwise
+            Tuple of (file content, filename) if successful, (None, None) otherwise
         """
         try:
             # Get payment advice
@@ -241,36 +284,9 @@ class SAPExportService:
             # Map payment advice lines to SAP format - BP/GL codes should already be enriched
             sap_rows = self.map_payment_advice_lines_to_sap_format(lines, payment_advice)
             
-            # Create DataFrame
-            df = pd.DataFrame(sap_rows)
-            
-            # Generate temporary file
-            with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                
-            # Write DataFrame to Excel without index and without header row
-            df.to_excel(temp_file_path, index=False, header=False, engine="openpyxl")
-            
-            # Optional: Format numbers to avoid scientific notation
-            try:
-                from openpyxl import load_workbook
-                wb = load_workbook(temp_file_path)
-                ws = wb.active
-                
-                # Format number columns properly
-                for row in ws.iter_rows(min_row=2):
-                    # Debit Amount column
-                    if row[17].value and row[17].value != "":
-                        row[17].number_format = '#,##0.00'
-                    
-                    # Credit Amount column
-                    if row[18].value and row[18].value != "":
-                        row[18].number_format = '#,##0.00'
-                        
-                wb.save(temp_file_path)
-            except Exception as e:
-                logger.warning(f"Error formatting Excel: {str(e)}")
-                # Continue without formatting - the basic export will still work
+            # Building the workbook is blocking pandas/openpyxl work; keep the
+            # event loop free while it runs
+            file_content = await asyncio.to_thread(self._build_sap_workbook, sap_rows)
             
             # Generate filename
             payment_advice_number = payment_advice.get("payment_advice_number", "unknown")
@@ -282,18 +298,18 @@ class SAPExportService:
                 
             filename = f"SAP_Export_{payment_advice_number}_{date_str}.xlsx"
             
-            logger.info(f"Generated SAP Excel file at {temp_file_path} with filename {filename}")
-            return temp_file_path, filename
+            logger.info(f"Generated SAP Excel file {filename} ({len(file_content)} bytes)")
+            return file_content, filename
         except Exception as e:
             logger.error(f"Error generating SAP Excel for {payment_advice_uuid}: {str(e)}")
             return None, None
             
-    async def upload_to_gcp(self, file_path: str, filename: str) -> Optional[str]:
+    async def upload_to_gcp(self, file_content: bytes, filename: str) -> Optional[str]:
         """
         Upload a file to GCP Storage and generate a presigned URL.
         
         Args:
-            file_path: Local path to file
+            file_content: Content of the file
             filename: Name for the uploaded file
             
         Returns:
@@ -304,29 +320,24 @@ class SAPExportService:
             destination_folder = f"sap_exports/{str(uuid4())}"
             
             # Upload file to GCP and get presigned URL (valid for 7 days)
-            url = self.gcs_uploader.upload_and_get_signed_url(
-                file_path=file_path,
+            url = await asyncio.to_thread(
+                self.gcs_uploader.upload_bytes_and_get_signed_url,
+                data=file_content,
                 destination_folder=destination_folder,
                 filename=filename,
+                content_type=XLSX_CONTENT_TYPE,
                 expiration_days=7
             )
             
             if not url:
-                logger.error(f"Failed to upload {file_path} to GCP")
+                logger.error(f"Failed to upload {filename} to GCP")
                 return None
                 
-            logger.info(f"Uploaded {file_path} to GCP and generated presigned URL valid for 7 days")
+            logger.info(f"Uploaded {filename} to GCP and generated presigned URL valid for 7 days")
             return url
         except Exception as e:
-            logger.error(f"Error uploading {file_path} to GCP: {str(e)}")
+            logger.error(f"Error uploading {filename} to GCP: {str(e)}")
             return None
-        finally:
-            # Clean up temporary file
-            try:
-                if os.path.exists(file_path):
-                    os.unlink(file_path)
-            except Exception as e:
-                logger.error(f"Error cleaning up {file_path}: {str(e)}")
             
     async def update_payment_advice_with_url(
         self, 
@@ -371,13 +382,13 @@ class SAPExportService:
         """
         try:
             # Generate SAP Excel
-            file_path, filename = await self.generate_sap_excel(payment_advice_uuid)
-            if not file_path or not filename:
+            file_content, filename = await self.generate_sap_excel(payment_advice_uuid)
+            if not file_content or not filename:
                 logger.error(f"Failed to generate SAP Excel for {payment_advice_uuid}")
                 return None
                 
             # Upload to GCP
-            url = await self.upload_to_gcp(file_path, filename)
+            url = await self.upload_to_gcp(file_content, filename)
             if not url:
                 logger.error(f"Failed to upload SAP Excel to GCP for {payment_advice_uuid}")
                 return None